@@ -0,0 +1,117 @@
+from fastapi import APIRouter, Request, HTTPException, status
+from core import SbugaFastAPI
+from helpers.erroring import ErrorDetailCode, ERROR_RESPONSE
+from helpers.session import get_session, Session
+from pjsk_api.breaker import breakers_snapshot
+from pjsk_api.governor import governors_snapshot
+from pjsk_api.metrics import metrics_snapshot
+
+router = APIRouter()
+
+
+@router.get(
+    "",
+    summary="PJSK client metrics",
+    description=(
+        "Per-region PJSK API metrics for the worker that answers: histograms (per "
+        "path template) of slot wait, upstream latency, payload size and "
+        "decrypt/unpack/ROW restore time, counters (upstream requests/statuses, "
+        "`pjsk_requests`, retries of those, re-auths, slots added, coalesced "
+        "and rate limited requests), each client's slot pool state and the "
+        "first-touch load time (ms) of each masterdata file it has loaded, the "
+        "outbound rate budgets per path class, the "
+        "upstream circuit breaker per region and the signing helper's health. "
+        "Requires `view_metrics` permission."
+    ),
+    responses={
+        200: {
+            "description": "Success",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "regions": {
+                            "jp": {
+                                "histograms": {
+                                    "upstream_ms": {
+                                        "/user/{n}/profile": {
+                                            "count": 10,
+                                            "avg": 120.5,
+                                            "p50": 100,
+                                            "p95": 250,
+                                            "max": 240.1,
+                                            "buckets": {"100": 6, "250": 4},
+                                        }
+                                    }
+                                },
+                                "counters": {"upstream_requests": 10},
+                            }
+                        },
+                        "clients": {
+                            "jp": {
+                                "num_users": 5,
+                                "slots_in_use": 2,
+                                "slot_wait": {},
+                                "master_load_ms": {"cards": 81.2},
+                            }
+                        },
+                        "rate_budgets": {
+                            "jp": {
+                                "default": {
+                                    "rate": 10,
+                                    "burst": 20,
+                                    "available": 14.5,
+                                    "used": 0.275,
+                                    "waiting": 0,
+                                    "rejected": 0,
+                                }
+                            }
+                        },
+                        "breakers": {
+                            "jp": {
+                                "open": False,
+                                "open_for": None,
+                                "failures": 0,
+                                "probes": 0,
+                            }
+                        },
+                        "gorgon": {"healthy": True, "restarts": 0},
+                    }
+                }
+            },
+        },
+        403: {
+            "description": f"Missing permission. (`{ErrorDetailCode.Forbidden}`)",
+            **ERROR_RESPONSE,
+        },
+    },
+    tags=["Manage"],
+)
+async def get_metrics(
+    request: Request,
+    session: Session = get_session(enforce_auth=True),
+):
+    app: SbugaFastAPI = request.app
+    await session.user()
+
+    if "view_metrics" not in session.permissions:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=ErrorDetailCode.Forbidden.value,
+        )
+
+    clients = {
+        region: {
+            "num_users": client.num_users,
+            "slots_in_use": sum(1 for slot in client._slots if slot.in_use),
+            "slot_wait": client.slot_wait_times(),
+            "master_load_ms": dict(client.master.load_times),
+        }
+        for region, client in app.pjsk_clients.items()
+    }
+    return {
+        "regions": metrics_snapshot(),
+        "clients": clients,
+        "rate_budgets": governors_snapshot(),
+        "breakers": breakers_snapshot(),
+        "gorgon": {"healthy": app.gorgon_healthy, "restarts": app.gorgon_restarts},
+    }
@@ -1,11 +1,12 @@
 import json
 import aiofiles
 
-from fastapi import APIRouter, Request, HTTPException, status
+from fastapi import APIRouter, Request, Response, HTTPException, status
 from typing import Literal
 
 from core import SbugaFastAPI
 from helpers.erroring import ErrorDetailCode, COMMON_RESPONSES
+from helpers.http_cache import cache_headers, make_etag, not_modified
 
 router = APIRouter()
 
@@ -30,18 +31,20 @@ router = APIRouter()
                 }
             },
         },
+        304: {"description": "Not modified (`If-None-Match` matched the ETag)"},
         503: COMMON_RESPONSES[503],
     },
     tags=["PJSK Data"],
 )
 async def get_assetinfo(
     request: Request,
+    response: Response,
     region: Literal["en", "jp"] = "jp",
     filter: str = "music/music_score",
 ):
     app: SbugaFastAPI = request.app
 
-    client = app.pjsk_clients.get(region)
+    client = app.master_client(region)
     if not client:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -55,6 +58,14 @@ async def get_assetinfo(
             detail="assetinfo not available",
         )
 
+    # assetinfo follows the asset version, not the dataVersion - it's rewritten
+    # whenever it changes
+    stat = assetinfo_path.stat()
+    etag = make_etag("assetinfo", region, filter, stat.st_size, stat.st_mtime_ns)
+    if cached := not_modified(request, etag):
+        return cached
+    response.headers.update(cache_headers(etag))
+
     async with aiofiles.open(assetinfo_path, "r", encoding="utf8") as f:
         assetinfo = json.loads(await f.read())
 
@@ -1,6 +1,7 @@
-from fastapi import APIRouter, Request, HTTPException, status
+from fastapi import APIRouter, Request, Response, HTTPException, status
 from core import SbugaFastAPI
 from helpers.erroring import ErrorDetailCode, ERROR_RESPONSE, COMMON_RESPONSES
+from helpers.http_cache import cache_headers, master_etag, not_modified
 from typing import Literal
 
 router = APIRouter()
@@ -36,25 +37,33 @@ def _is_comic(tip: dict) -> bool:
                 }
             },
         },
+        304: {"description": "Not modified (`If-None-Match` matched the ETag)"},
         503: COMMON_RESPONSES[503],
     },
     tags=["PJSK Data"],
 )
 async def get_comics(
     request: Request,
+    response: Response,
     region: Literal["en", "jp"],
     image_type: Literal["png", "webp"] = "webp",
 ):
     app: SbugaFastAPI = request.app
 
-    client = app.pjsk_clients.get(region)
+    client = app.master_client(region)
     if not client:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=ErrorDetailCode.PJSKClientUnavailable.value,
         )
 
-    tips: list = await client.get_master("tips")
+    master = client.master
+    etag = master_etag(master, ("tips",), region, image_type)
+    if cached := not_modified(request, etag):
+        return cached
+    response.headers.update(cache_headers(etag))
+
+    tips: list = await master.get("tips")
 
     comics = [
         {
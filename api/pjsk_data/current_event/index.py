@@ -2,6 +2,8 @@ from core import SbugaFastAPI
 
 from fastapi import APIRouter, Request, HTTPException, status
 from helpers.erroring import ErrorDetailCode, COMMON_RESPONSES
+from helpers.json_response import FastJSONResponse
+from pjsk_api.client import RequestPriority
 from pjsk_api.requests import event as pjsk_event_requests
 from typing import Literal
 import time, asyncio, json
@@ -156,14 +158,14 @@ async def current_event(
     prev = cached.get(region, {})
     # fresh=true bypasses the 5-minute cache and pulls straight from PJSK (still updating the cache)
     if not fresh and prev.get("updated", 0) + CACHE_TTL > time.time():
-        return prev
+        return FastJSONResponse(prev)
 
     lock = get_lock(region)
 
     async with lock:
         prev = cached.get(region, {})
         if not fresh and prev.get("updated", 0) + CACHE_TTL > time.time():
-            return prev
+            return FastJSONResponse(prev)
 
         file_cache = cached.get(region) or None
 
@@ -181,15 +183,18 @@ async def current_event(
                 }
                 cached[region] = data
                 asyncio.create_task(_save_cache(data, cache_path))
-                return data
+                return FastJSONResponse(data)
 
+            leaderboard_req = pjsk_event_requests.leaderboard_request(
+                client, event["id"]
+            )
+            border_req = pjsk_event_requests.border_request(client, event["id"])
+            if fresh:
+                leaderboard_req.priority = RequestPriority.INTERACTIVE
+                border_req.priority = RequestPriority.INTERACTIVE
             top_100, border = await asyncio.gather(
-                app.pjsk_request(
-                    region, pjsk_event_requests.leaderboard_request(client, event["id"])
-                ),
-                app.pjsk_request(
-                    region, pjsk_event_requests.border_request(client, event["id"])
-                ),
+                app.pjsk_request(region, leaderboard_req),
+                app.pjsk_request(region, border_req),
             )
 
             data = {
@@ -202,7 +207,7 @@ async def current_event(
             }
             cached[region] = data
             asyncio.create_task(_save_cache(data, cache_path))
-            return data
+            return FastJSONResponse(data)
 
         except HTTPException as e:
             raise HTTPException(
@@ -1,6 +1,7 @@
 from core import SbugaFastAPI
 from fastapi import APIRouter, Request, HTTPException, status
 from helpers.erroring import ErrorDetailCode, ERROR_RESPONSE, COMMON_RESPONSES
+from helpers.json_response import FastJSONResponse
 from pjsk_api.requests import ranked as pjsk_ranked_requests
 from typing import Literal
 import time
@@ -182,14 +183,14 @@ async def current_ranked(request: Request, region: Literal["en", "jp", "tw", "kr
 
     prev = cached.get(region, {})
     if prev.get("updated", 0) + CACHE_TTL > time.time():
-        return prev
+        return FastJSONResponse(prev)
 
     lock = get_lock(region)
 
     async with lock:
         prev = cached.get(region, {})
         if prev.get("updated", 0) + CACHE_TTL > time.time():
-            return prev
+            return FastJSONResponse(prev)
 
         file_cache = cached.get(region) or None
 
@@ -207,7 +208,7 @@ async def current_ranked(request: Request, region: Literal["en", "jp", "tw", "kr
                 }
                 cached[region] = data
                 asyncio.create_task(_save_cache(data, cache_path))
-                return data
+                return FastJSONResponse(data)
 
             top_100 = await app.pjsk_request(
                 region, pjsk_ranked_requests.leaderboard_request(client, season["id"])
@@ -224,7 +225,7 @@ async def current_ranked(request: Request, region: Literal["en", "jp", "tw", "kr
             }
             cached[region] = data
             asyncio.create_task(_save_cache(data, cache_path))
-            return data
+            return FastJSONResponse(data)
 
         except HTTPException as e:
             raise HTTPException(
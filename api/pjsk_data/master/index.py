@@ -1,8 +1,13 @@
 from fastapi import APIRouter, Request, HTTPException, status
 from typing import Literal
+import asyncio
 
 from core import SbugaFastAPI
 from helpers.erroring import ErrorDetailCode, COMMON_RESPONSES, ERROR_RESPONSE
+from helpers.compiled_cache import CompiledCache, encode_json
+from helpers.http_cache import compiled_response
+from pjsk_api.master import MasterSnapshot
+from pjsk_api.shared_master import SharedMasterTable
 
 router = APIRouter()
 
@@ -28,6 +33,28 @@ ALLOWED_FILES = {
     "skills",
 }
 
+# (region, file) -> the file's json, compiled once per file content
+_compiled = CompiledCache()
+
+
+def _file_version(master: MasterSnapshot, file: str) -> str:
+    # unchanged files keep their compiled body across data updates
+    return (master.hashes or {}).get(file) or master.data_version
+
+
+async def _compile_master_file(
+    app: SbugaFastAPI, region: str, file: str
+) -> tuple[bytes, str, None]:
+    # resolved here rather than captured: the cache keeps this builder, and a
+    # captured snapshot would stay in memory after every swap
+    master = app.master_client(region).master
+    version = _file_version(master, file)
+    data = await master.get(file)
+    if isinstance(data, SharedMasterTable):
+        data = list(data)
+    body = await asyncio.to_thread(encode_json, data)
+    return body, version, None
+
 
 @router.get(
     "/{file}",
@@ -42,6 +69,7 @@ ALLOWED_FILES = {
             "description": "Success (raw masterdata contents, usually a JSON array)",
             "content": {"application/json": {"example": [{"id": 1}]}},
         },
+        304: {"description": "Not modified (`If-None-Match` matched the ETag)"},
         404: {
             "description": f"File not allowed or not present for this region. (`{ErrorDetailCode.NotFound}`)",
             **ERROR_RESPONSE,
@@ -63,17 +91,29 @@ async def get_master_file(
             detail=ErrorDetailCode.NotFound.value,
         )
 
-    client = app.pjsk_clients.get(region)
+    client = app.master_client(region)
     if not client:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=ErrorDetailCode.PJSKClientUnavailable.value,
         )
 
+    master = client.master
+    if not (master.master_path / f"{file}.json").exists():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=ErrorDetailCode.NotFound.value,
+        )
+    key = (region, file)
     try:
-        return await client.get_master(file)
+        compiled = await _compiled.get(
+            key,
+            _file_version(master, file),
+            lambda: _compile_master_file(app, region, file),
+        )
     except OSError:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=ErrorDetailCode.NotFound.value,
         )
+    return compiled_response(request, compiled)
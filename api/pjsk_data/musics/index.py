@@ -1,12 +1,16 @@
 from fastapi import APIRouter, Request, HTTPException, status
 from core import SbugaFastAPI
-from typing import Literal
+from typing import Literal, Mapping, Sequence
 import asyncio
+import time
 from pydantic import BaseModel
 
+from helpers.compiled_cache import CompiledCache, encode_json
 from helpers.erroring import ErrorDetailCode, ERROR_RESPONSE, COMMON_RESPONSES
+from helpers.http_cache import compiled_response
 from helpers.converters import match_song
-from helpers.converter_maps import _song_maps
+from helpers.converter_maps import _song_maps, song_maps_generation
+from pjsk_api.master import on_master_swap
 
 router = APIRouter()
 
@@ -25,24 +29,26 @@ class MusicSearchBody(BaseModel):
 
 def _build_music(
     music: dict,
-    vocals: list,
-    tags: list,
+    vocals: Sequence[dict],
+    tags: Sequence[dict],
     original: dict | None,
     collaboration: dict | None,
-    difficulties: list,
-    asset_variants: list,
-    artists: list,
+    difficulties: Sequence[dict],
+    asset_variants: Mapping[int, Sequence[dict]],
+    artist: dict | None,
+    title_variants: list[str],
     game_characters: dict,
     outside_characters: dict,
     asset_base_url: str,
     region: str,
     image_type: Literal["webp", "png"],
 ) -> dict:
+    """`vocals`, `tags` and `difficulties` are this music's rows,
+    `asset_variants` is grouped by musicVocalId (see _compile_musics)."""
     music_id = music["id"]
-    map_region = region
     region = ASSET_REGION.get(region, region)
 
-    music_tags = [t["musicTag"] for t in tags if t["musicId"] == music_id]
+    music_tags = [t["musicTag"] for t in tags]
     # nuverse (tw/kr) masterdata wraps categories: [{"musicCategoryName": "mv"}]
     categories = [
         c["musicCategoryName"] if isinstance(c, dict) else c
@@ -51,7 +57,6 @@ def _build_music(
     original_video = original["videoLink"] if original else None
     collab_label = collaboration["label"] if collaboration else None
     collab_id = collaboration["id"] if collaboration else None
-    artist = next((a for a in artists if a["id"] == music.get("creatorArtistId")), None)
 
     padded_id = f"{music_id:04d}"
     music_difficulties = [
@@ -62,7 +67,6 @@ def _build_music(
             "chart_url": f"{asset_base_url}/pjsk_data/{region}/music/music_score/{padded_id}_01/{d['musicDifficulty']}.txt",
         }
         for d in difficulties
-        if d["musicId"] == music_id
     ]
 
     ab_name = music["assetbundleName"]
@@ -76,12 +80,8 @@ def _build_music(
 
     music_vocals = []
     for vocal in vocals:
-        if vocal["musicId"] != music_id:
-            continue
         variants = []
-        for v in asset_variants:
-            if v["musicVocalId"] != vocal["id"]:
-                continue
+        for v in asset_variants.get(vocal["id"], ()):
             vd = {
                 "id": v["id"],
                 "seq": v["seq"],
@@ -124,11 +124,6 @@ def _build_music(
             }
         )
 
-    region_map = _song_maps.get(map_region, {})
-    title_variants = list(
-        dict.fromkeys(key for key, (mid, _) in region_map.items() if mid == music_id)
-    )
-
     used_game_ids = set()
     used_outside_ids = set()
     for v in music_vocals:
@@ -185,7 +180,7 @@ def _build_music(
 
 def _build_music_simple(
     music: dict,
-    difficulties: list,
+    difficulties: Sequence[dict],
     asset_base_url: str,
     region: str,
     image_type: Literal["webp", "png"],
@@ -198,13 +193,161 @@ def _build_music_simple(
     return {
         "id": music_id,
         "title": music["title"],
-        "difficulties": [
-            d["musicDifficulty"] for d in difficulties if d["musicId"] == music_id
-        ],
+        "difficulties": [d["musicDifficulty"] for d in difficulties],
         "jacket_url": jacket_url,
     }
 
 
+# compiled /musics and /musics/simple bodies, per
+# (kind, region, image_type, ignore_leak)
+_compiled = CompiledCache()
+
+# masterdata the compiled responses are built from
+_MUSICS_SOURCES = (
+    "musics",
+    "musicVocals",
+    "musicTags",
+    "musicOriginals",
+    "musicCollaborations",
+    "musicDifficulties",
+    "musicAssetVariants",
+    "musicArtists",
+    "gameCharacters",
+    "outsideCharacters",
+)
+
+
+def _title_variants(region: str) -> dict[int, list[str]]:
+    """music id -> its fuzzy-match keys (map order, no duplicates)"""
+    grouped: dict[int, dict[str, None]] = {}
+    for key, (music_id, _) in _song_maps.get(region, {}).items():
+        grouped.setdefault(music_id, {})[key] = None
+    return {music_id: list(keys) for music_id, keys in grouped.items()}
+
+
+def _next_publish(app: SbugaFastAPI, musics, ignore_leak: bool) -> float | None:
+    """When the next leaked music gets published (unix seconds), i.e. when a
+    response that hides leaks goes stale."""
+    if ignore_leak or not app.config.pjsk.hide_leaks:
+        return None
+    now = time.time() * 1000
+    upcoming = [m["publishedAt"] for m in musics if m["publishedAt"] > now]
+    return min(upcoming) / 1000 if upcoming else None
+
+
+async def _compile_musics_simple(
+    app: SbugaFastAPI,
+    region: str,
+    image_type: Literal["webp", "png"],
+    ignore_leak: bool,
+) -> tuple[bytes, tuple, float | None]:
+    # one snapshot for the whole build, so a data update mid-build can't mix versions
+    master = app.master_client(region).master
+    musics, difficulties = await asyncio.gather(
+        master.get("musics"),
+        master.get("musicDifficulties"),
+    )
+
+    difficulties_by_music = difficulties.grouped("musicId")
+    result = [
+        _build_music_simple(
+            music=music,
+            difficulties=difficulties_by_music.get(music["id"], ()),
+            asset_base_url=app.s3_asset_base_url,
+            region=region,
+            image_type=image_type,
+        )
+        for music in musics
+        if ignore_leak or not app.check_leak(music["publishedAt"])
+    ]
+
+    body = await asyncio.to_thread(encode_json, {"musics": result})
+    return body, (master.data_version,), _next_publish(app, musics, ignore_leak)
+
+
+async def _compile_musics(
+    app: SbugaFastAPI,
+    region: str,
+    image_type: Literal["webp", "png"],
+    ignore_leak: bool,
+) -> tuple[bytes, tuple, float | None]:
+    # one snapshot for the whole build, so a data update mid-build can't mix versions
+    master = app.master_client(region).master
+    version = (master.data_version, song_maps_generation())
+    (
+        musics,
+        vocals,
+        tags,
+        originals,
+        collaborations,
+        difficulties,
+        asset_variants,
+        artists,
+        game_chars_raw,
+        outside_chars_raw,
+    ) = await asyncio.gather(
+        master.get("musics"),
+        master.get("musicVocals"),
+        master.get("musicTags"),
+        master.get("musicOriginals"),
+        master.get("musicCollaborations"),
+        master.get("musicDifficulties"),
+        master.get("musicAssetVariants"),
+        master.get("musicArtists"),
+        master.get("gameCharacters"),
+        master.get("outsideCharacters"),
+    )
+
+    game_characters = {
+        c["id"]: {
+            "givenName": c.get("givenName", ""),
+            "firstName": c.get("firstName", ""),
+            "unit": c.get("unit", ""),
+        }
+        for c in game_chars_raw
+    }
+    outside_characters = {c["id"]: {"name": c["name"]} for c in outside_chars_raw}
+
+    originals_by_music = {o["musicId"]: o for o in originals}
+    collaborations_by_id = {c["id"]: c for c in collaborations}
+    # group every joined table once so the build is linear in the row count
+    vocals_by_music = vocals.grouped("musicId")
+    tags_by_music = tags.grouped("musicId")
+    difficulties_by_music = difficulties.grouped("musicId")
+    variants_by_vocal = asset_variants.grouped("musicVocalId")
+    title_variants = _title_variants(region)
+
+    result = [
+        _build_music(
+            music=music,
+            vocals=vocals_by_music.get(music["id"], ()),
+            tags=tags_by_music.get(music["id"], ()),
+            original=originals_by_music.get(music["id"]),
+            collaboration=collaborations_by_id.get(music.get("musicCollaborationId")),
+            difficulties=difficulties_by_music.get(music["id"], ()),
+            asset_variants=variants_by_vocal,
+            artist=artists.find(music.get("creatorArtistId")),
+            title_variants=title_variants.get(music["id"], []),
+            game_characters=game_characters,
+            outside_characters=outside_characters,
+            asset_base_url=app.s3_asset_base_url,
+            region=region,
+            image_type=image_type,
+        )
+        for music in musics
+        if ignore_leak or not app.check_leak(music["publishedAt"])
+    ]
+
+    body = await asyncio.to_thread(encode_json, {"musics": result})
+    return body, version, _next_publish(app, musics, ignore_leak)
+
+
+@on_master_swap
+async def _refresh_compiled(client, old, new) -> None:
+    if new.touches(_MUSICS_SOURCES):
+        _compiled.refresh(lambda key: key[1] == client.region)
+
+
 @router.get(
     "/simple",
     summary="Get musics (simple)",
@@ -233,6 +376,7 @@ def _build_music_simple(
                 }
             },
         },
+        304: {"description": "Not modified (`If-None-Match` matched the ETag)"},
         503: COMMON_RESPONSES[503],
     },
     tags=["PJSK Data"],
@@ -245,31 +389,20 @@ async def get_musics_simple(
 ):
     app: SbugaFastAPI = request.app
 
-    client = app.pjsk_clients.get(region)
+    client = app.master_client(region)
     if not client:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=ErrorDetailCode.PJSKClientUnavailable.value,
         )
 
-    musics, difficulties = await asyncio.gather(
-        client.get_master("musics"),
-        client.get_master("musicDifficulties"),
+    key = ("simple", region, image_type, ignore_leak)
+    compiled = await _compiled.get(
+        key,
+        (client.master.data_version,),
+        lambda: _compile_musics_simple(app, region, image_type, ignore_leak),
     )
-
-    result = [
-        _build_music_simple(
-            music=music,
-            difficulties=difficulties,
-            asset_base_url=app.s3_asset_base_url,
-            region=region,
-            image_type=image_type,
-        )
-        for music in musics
-        if ignore_leak or not app.check_leak(music["publishedAt"])
-    ]
-
-    return {"musics": result}
+    return compiled_response(request, compiled)
 
 
 @router.get(
@@ -354,6 +487,7 @@ async def get_musics_simple(
                 }
             },
         },
+        304: {"description": "Not modified (`If-None-Match` matched the ETag)"},
         503: COMMON_RESPONSES[503],
     },
     tags=["PJSK Data"],
@@ -366,71 +500,20 @@ async def get_musics(
 ):
     app: SbugaFastAPI = request.app
 
-    client = app.pjsk_clients.get(region)
+    client = app.master_client(region)
     if not client:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=ErrorDetailCode.PJSKClientUnavailable.value,
         )
 
-    (
-        musics,
-        vocals,
-        tags,
-        originals,
-        collaborations,
-        difficulties,
-        asset_variants,
-        artists,
-        game_chars_raw,
-        outside_chars_raw,
-    ) = await asyncio.gather(
-        client.get_master("musics"),
-        client.get_master("musicVocals"),
-        client.get_master("musicTags"),
-        client.get_master("musicOriginals"),
-        client.get_master("musicCollaborations"),
-        client.get_master("musicDifficulties"),
-        client.get_master("musicAssetVariants"),
-        client.get_master("musicArtists"),
-        client.get_master("gameCharacters"),
-        client.get_master("outsideCharacters"),
+    key = ("full", region, image_type, ignore_leak)
+    compiled = await _compiled.get(
+        key,
+        (client.master.data_version, song_maps_generation()),
+        lambda: _compile_musics(app, region, image_type, ignore_leak),
     )
-
-    game_characters = {
-        c["id"]: {
-            "givenName": c.get("givenName", ""),
-            "firstName": c.get("firstName", ""),
-            "unit": c.get("unit", ""),
-        }
-        for c in game_chars_raw
-    }
-    outside_characters = {c["id"]: {"name": c["name"]} for c in outside_chars_raw}
-
-    originals_by_music = {o["musicId"]: o for o in originals}
-    collaborations_by_id = {c["id"]: c for c in collaborations}
-
-    result = [
-        _build_music(
-            music=music,
-            vocals=vocals,
-            tags=tags,
-            original=originals_by_music.get(music["id"]),
-            collaboration=collaborations_by_id.get(music.get("musicCollaborationId")),
-            difficulties=difficulties,
-            asset_variants=asset_variants,
-            artists=artists,
-            game_characters=game_characters,
-            outside_characters=outside_characters,
-            asset_base_url=app.s3_asset_base_url,
-            region=region,
-            image_type=image_type,
-        )
-        for music in musics
-        if ignore_leak or not app.check_leak(music["publishedAt"])
-    ]
-
-    return {"musics": result}
+    return compiled_response(request, compiled)
 
 
 @router.post(
@@ -473,26 +556,19 @@ async def search_musics(
         if body.region:
             client = app.pjsk_clients[body.region]
             musics = await client.get_master("musics")
-            result_set = set(results)
-            publish_map = {
-                music["id"]: music["publishedAt"]
-                for music in musics
-                if music["id"] in result_set
-            }
-            filtered = [
-                mid
-                for mid in results
-                if mid not in publish_map or not app.check_leak(publish_map[mid])
-            ]
+            filtered = []
+            for mid in results:
+                music = musics.find(mid)
+                if music is None or not app.check_leak(music["publishedAt"]):
+                    filtered.append(mid)
         else:
-            result_set = set(results)
-            leaked = set(result_set)
+            leaked = set(results)
             for region, client in app.pjsk_clients.items():
                 musics = await client.get_master("musics")
                 not_leaked_in_region = {
-                    music["id"]
-                    for music in musics
-                    if music["id"] in result_set
+                    mid
+                    for mid in leaked
+                    if (music := musics.find(mid)) is not None
                     and not app.check_leak(music["publishedAt"])
                 }
                 leaked -= not_leaked_in_region
@@ -0,0 +1,142 @@
+# api/pjsk_data/profile/batch.py
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Literal
+
+from fastapi import APIRouter, Request, HTTPException, status
+from pydantic import BaseModel, Field
+
+from core import SbugaFastAPI
+from helpers.erroring import ErrorDetailCode, COMMON_RESPONSES
+from helpers.profiles import cleanup_cache, fetch_profile, get_cached_profile
+from pjsk_api.client import RequestPriority
+
+router = APIRouter()
+
+MAX_BATCH = 100
+
+# region -> upstream fetches running for all batches together
+running: dict[str, int] = {}
+conditions: dict[str, asyncio.Condition] = {}
+
+
+def _fetch_limit(app: SbugaFastAPI, region: str) -> int:
+    # read from the pool as it is now - it grows and shrinks with demand
+    client = app.pjsk_clients.get(region)
+    if not client:
+        return 1
+    return max(1, client.num_users - client.reserved_slots)
+
+
+@asynccontextmanager
+async def batch_fetch_slot(app: SbugaFastAPI, region: str):
+    condition = conditions.setdefault(region, asyncio.Condition())
+    async with condition:
+        await condition.wait_for(
+            lambda: running.get(region, 0) < _fetch_limit(app, region)
+        )
+        running[region] = running.get(region, 0) + 1
+    try:
+        yield
+    finally:
+        async with condition:
+            running[region] -= 1
+            condition.notify_all()
+
+
+class ProfileBatchBody(BaseModel):
+    region: Literal["en", "jp", "tw", "kr"]
+    user_ids: list[int] = Field(min_length=1, max_length=MAX_BATCH)
+
+
+@router.post(
+    "",
+    summary="PJSK user profiles (batch)",
+    description=(
+        f"Returns up to **{MAX_BATCH}** PJSK user profiles by ID. "
+        "Cached profiles (same **5 minute** cache as the single profile route) are answered "
+        "immediately, the rest are fetched in parallel. Every ID gets its own entry: "
+        "`status` is `ok` with the same fields as the single profile route, or `error` "
+        "with a `detail` code - one failing ID doesn't fail the request."
+    ),
+    responses={
+        200: {
+            "description": "Success",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "profiles": {
+                            "123456789": {
+                                "status": "ok",
+                                "updated": 1700000000.0,
+                                "next_available_update": 1700000300.0,
+                                "profile": {},
+                            },
+                            "1": {
+                                "status": "error",
+                                "detail": ErrorDetailCode.NotFound.value,
+                            },
+                        }
+                    }
+                }
+            },
+        },
+        400: COMMON_RESPONSES[400],
+        503: COMMON_RESPONSES[503],
+    },
+    tags=["PJSK Data"],
+)
+async def get_profiles(request: Request, body: ProfileBatchBody):
+    app: SbugaFastAPI = request.app
+
+    client = app.pjsk_clients.get(body.region)
+    if not client:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=ErrorDetailCode.PJSKClientUnavailable.value,
+        )
+
+    asyncio.create_task(asyncio.to_thread(cleanup_cache))
+
+    user_ids = list(dict.fromkeys(body.user_ids))
+    profiles: dict[str, dict] = {}
+    misses = []
+    for user_id in user_ids:
+        prev = get_cached_profile(body.region, user_id)
+        if prev:
+            profiles[str(user_id)] = {"status": "ok", **prev}
+        else:
+            misses.append(user_id)
+
+    # batch fetches run at BACKGROUND priority, so the client keeps its reserved
+    # slots for single lookups however many batches are running; the shared
+    # limit stops concurrent batches from queueing more than the pool can take
+    async def _fetch(user_id: int):
+        async with batch_fetch_slot(app, body.region):
+            try:
+                data = await fetch_profile(
+                    app, body.region, user_id, priority=RequestPriority.BACKGROUND
+                )
+            except HTTPException as e:
+                detail = e.detail
+                if isinstance(detail, dict):
+                    detail = detail.get("detail")
+                if e.status_code >= 500 and detail not in (
+                    ErrorDetailCode.PJSKMaintainence.value,
+                    ErrorDetailCode.PJSKClientUnavailable.value,
+                    ErrorDetailCode.PJSKRateLimited.value,
+                ):
+                    detail = ErrorDetailCode.InternalServerError.value
+                profiles[str(user_id)] = {"status": "error", "detail": detail}
+                return
+            except Exception as e:
+                print(f"[{body.region}] Batch profile {user_id} failed: {e!r}")
+                profiles[str(user_id)] = {
+                    "status": "error",
+                    "detail": ErrorDetailCode.InternalServerError.value,
+                }
+                return
+            profiles[str(user_id)] = {"status": "ok", **data}
+
+    await asyncio.gather(*(_fetch(user_id) for user_id in misses))
+    return {"profiles": {str(user_id): profiles[str(user_id)] for user_id in user_ids}}
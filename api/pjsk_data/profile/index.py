@@ -1,33 +1,13 @@
 # api/pjsk_data/profile/index.py
 from core import SbugaFastAPI
-from fastapi import APIRouter, Request, HTTPException, status
+from fastapi import APIRouter, Request
 from helpers.erroring import ErrorDetailCode, ERROR_RESPONSE, COMMON_RESPONSES
-from pjsk_api.requests.profile import profile_request
+from helpers.profiles import cleanup_cache, fetch_profile
 from typing import Literal
-import time
 import asyncio
 
 router = APIRouter()
 
-cached: dict[str, dict] = {}  # key: "{region}:{user_id}"
-locks: dict[str, asyncio.Lock] = {}
-CACHE_TTL = 300
-FRESH_TTL = 10  # floor for fresh=true requests so one profile can't be hammered
-
-
-def get_lock(key: str) -> asyncio.Lock:
-    if key not in locks:
-        locks[key] = asyncio.Lock()
-    return locks[key]
-
-
-def _cleanup_cache():
-    now = time.time()
-    expired = [k for k, v in cached.items() if v.get("updated", 0) + CACHE_TTL < now]
-    for k in expired:
-        cached.pop(k, None)
-        locks.pop(k, None)
-
 
 @router.get(
     "/{user_id}",
@@ -66,44 +46,5 @@ async def get_profile(
 ):
     app: SbugaFastAPI = request.app
 
-    asyncio.create_task(asyncio.to_thread(_cleanup_cache))
-
-    cache_key = f"{region}:{user_id}"
-    ttl = FRESH_TTL if fresh else CACHE_TTL
-
-    prev = cached.get(cache_key)
-    if prev and prev.get("updated", 0) + ttl > time.time():
-        return prev
-
-    lock = get_lock(cache_key)
-
-    async with lock:
-        prev = cached.get(cache_key)
-        if prev and prev.get("updated", 0) + ttl > time.time():
-            return prev
-
-        client = app.pjsk_clients.get(region)
-        if not client:
-            raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail=ErrorDetailCode.PJSKClientUnavailable.value,
-            )
-
-        try:
-            profile = await app.pjsk_request(region, profile_request(client, user_id))
-        except HTTPException as e:
-            if e.status_code == 404:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=ErrorDetailCode.NotFound.value,
-                )
-            else:
-                raise e
-        updated = time.time()
-        data = {
-            "updated": updated,
-            "next_available_update": updated + CACHE_TTL,
-            "profile": profile,
-        }
-        cached[cache_key] = data
-        return data
+    asyncio.create_task(asyncio.to_thread(cleanup_cache))
+    return await fetch_profile(app, region, user_id, fresh)
@@ -1,6 +1,7 @@
-from fastapi import APIRouter, Request, HTTPException, status
+from fastapi import APIRouter, Request, Response, HTTPException, status
 from core import SbugaFastAPI
 from helpers.erroring import ErrorDetailCode, COMMON_RESPONSES
+from helpers.http_cache import cache_headers, master_etag, not_modified
 from typing import Literal
 
 router = APIRouter()
@@ -37,25 +38,33 @@ router = APIRouter()
                 }
             },
         },
+        304: {"description": "Not modified (`If-None-Match` matched the ETag)"},
         503: COMMON_RESPONSES[503],
     },
     tags=["PJSK Data"],
 )
 async def get_stamps(
     request: Request,
+    response: Response,
     region: Literal["en", "jp"],
     image_type: Literal["png", "webp"] = "webp",
 ):
     app: SbugaFastAPI = request.app
 
-    client = app.pjsk_clients.get(region)
+    client = app.master_client(region)
     if not client:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=ErrorDetailCode.PJSKClientUnavailable.value,
         )
 
-    stamps_data: list = await client.get_master("stamps")
+    master = client.master
+    etag = master_etag(master, ("stamps",), region, image_type)
+    if cached := not_modified(request, etag):
+        return cached
+    response.headers.update(cache_headers(etag))
+
+    stamps_data: list = await master.get("stamps")
 
     def get_character_ids(stamp: dict) -> list[int]:
         ids = []
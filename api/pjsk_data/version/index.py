@@ -36,7 +36,7 @@ async def get_version(
 ):
     app: SbugaFastAPI = request.app
 
-    client = app.pjsk_clients.get(region)
+    client = app.master_client(region)
     if not client:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -0,0 +1,55 @@
+from fastapi import APIRouter, Request
+
+from core import SbugaFastAPI
+
+router = APIRouter()
+
+
+@router.get(
+    "",
+    summary="Startup readiness",
+    description=(
+        "State (`starting`, `ready` or `failed`) and duration in seconds of each "
+        "startup phase of the worker that answers: `db`, `gorgon` (request "
+        "signing helper), `<region>.master` (masterdata from the last run "
+        "loaded, so masterdata-only routes already work) and `<region>` "
+        "(client authenticated and synced). `ready` lists the regions whose "
+        "clients are fully up."
+    ),
+    responses={
+        200: {
+            "description": "Success",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "phases": {
+                            "db": {"state": "ready", "seconds": 0.041},
+                            "gorgon": {
+                                "state": "starting",
+                                "seconds": None,
+                            },
+                            "en.master": {
+                                "state": "ready",
+                                "seconds": 0.82,
+                            },
+                        },
+                        "ready": [],
+                        "serving_master": ["en"],
+                    }
+                }
+            },
+        },
+    },
+    tags=["Status"],
+)
+async def get_status(request: Request):
+    app: SbugaFastAPI = request.app
+    # errors stay in the logs - this route is public
+    return {
+        "phases": {
+            name: {"state": phase["state"], "seconds": phase["seconds"]}
+            for name, phase in app.readiness.items()
+        },
+        "ready": sorted(app.pjsk_clients),
+        "serving_master": sorted(set(app.pjsk_clients) | set(app.master_clients)),
+    }
@@ -59,7 +59,7 @@ async def get_chart(
 ):
     app: SbugaFastAPI = request.app
 
-    client = app.pjsk_clients.get(region)
+    client = app.master_client(region)
     if not client:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -77,7 +77,7 @@ async def get_chart(
 
     # mirrored: load the local chart (rendering it if missing) and flip it
     musics = await client.get_master("musics")
-    music = next((m for m in musics if m["id"] == music_id), None)
+    music = musics.find(music_id)
     if not music:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -108,13 +108,13 @@ async def _normalize_info(client, chart_id: str, info: dict) -> dict | None:
 
     score_id = official.get("customMusicScoreId") or chart_id
     creators = await client.get_master("customMusicScoreOfficialCreators")
-    entry = next((c for c in creators if c.get("scoreId") == score_id), None)
+    entry = creators.find(score_id, key="scoreId")
     if not entry:
         return None
 
     profiles = await client.get_master("customMusicScoreOfficialCreatorProfiles")
     profile_id = entry.get("customMusicScoreOfficialCreatorProfileId")
-    profile = next((p for p in profiles if p.get("id") == profile_id), None)
+    profile = profiles.find(profile_id)
     tags = [entry.get(f"tagId{i}") for i in (1, 2, 3)]
 
     return {
@@ -300,7 +300,7 @@ async def _build_image(
     jacket = ""
     if music_id is not None:
         musics = await client.get_master("musics")
-        music = next((m for m in musics if m.get("id") == music_id), None)
+        music = musics.find(music_id)
         jacket = jacket_source(client.data_path, app.s3_asset_base_url, region, music)
 
     try:
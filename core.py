@@ -1,9 +1,9 @@
-import asyncio, time, subprocess, sys
+import asyncio, random, time, subprocess, sys
 from fastapi import FastAPI, Request
 from fastapi import status, HTTPException
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
 from helpers.config_loader import Config
+from helpers.json_response import FastJSONResponse
 from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
 from database import DBConnWrapper
@@ -12,12 +12,24 @@ import asyncpg
 import aiohttp
 import aioboto3
 
-from typing import AsyncGenerator, Optional
+from typing import AsyncGenerator, Awaitable, Callable, Optional
 
 from helpers.erroring import ErrorDetailCode
 
 from pjsk_api import clients, PJSKClient, set_client
-from pjsk_api.client import RequestData, T
+from pjsk_api.breaker import is_outage, region_breaker
+from pjsk_api.master import shutdown_process_pool
+from pjsk_api.client import (
+    RequestData,
+    RequestPriority,
+    T,
+    background_requests,
+    counting_retries,
+)
+from pjsk_api.master import read_data_version
+from pjsk_api.governor import RateLimited
+from pjsk_api.metrics import region_metrics
+from pjsk_api.sessions import restore_sessions, save_sessions
 from pjsk_api.requests.authenticate_client import authenticate_client
 from pjsk_api.requests.authenticate_client_row import (
     authenticate_client as authenticate_client_row,
@@ -25,12 +37,20 @@ from pjsk_api.requests.authenticate_client_row import (
 from pjsk_api.requests.ensure_updated_masterdata import ensure_updated_masterdata
 from pjsk_api.requests.ensure_updated_assetinfo import ensure_updated_assetinfo
 from pjsk_api.requests.check_data_update import check_data_update
+from pjsk_api.requests.profile import profile_request
 from pjsk_api.asset_handlers import download_and_process_assets
 from pjsk_api.requests.request_handling import request_with_retry
 from pjsk_api.app_ver_hash import get_en, get_jp, get_tw, get_kr, get_cn
 from helpers.converter_maps import rebuild_maps
 
 _error_detail_values = {e.value for e in ErrorDetailCode}
+DATA_CHECK_INTERVAL = 60  # seconds between a region's data update checks
+DATA_CHECK_MAX_INTERVAL = 600  # backed off interval while checks keep failing
+DATA_CHECK_REPORT_AFTER = 3  # quick retries before a failure is logged
+DATA_CHECK_JITTER = 0.2  # +-20% on every delay
+GORGON_URL = "http://127.0.0.1:5001"
+GORGON_CHECK_INTERVAL = 15  # seconds between helper health checks
+GORGON_MAX_FAILED_CHECKS = 3  # failed checks in a row before it's respawned
 _clients_ready = 0
 _clients_ready_lock = asyncio.Lock()
 
@@ -46,14 +66,21 @@ _get_version_fns = {
 def _extract_detail(exc_detail) -> tuple[str, dict | None]:
     """Returns (detail_code, cached_data | None)"""
     if isinstance(exc_detail, dict):
-        return exc_detail.get(
-            "detail", ErrorDetailCode.InternalServerError.value
-        ), exc_detail.get("cached_data")
+        detail = exc_detail.get("detail", ErrorDetailCode.InternalServerError.value)
+        cached_data = exc_detail.get("cached_data")
+        if isinstance(detail, dict):
+            # a route re-raised an error that already carried cached_data
+            detail, inner_cached_data = _extract_detail(detail)
+            cached_data = cached_data or inner_cached_data
+        return detail, cached_data
+    if not isinstance(exc_detail, str):
+        return ErrorDetailCode.InternalServerError.value, None
     return exc_detail, None
 
 
 class SbugaFastAPI(FastAPI):
     def __init__(self, config: Config, *args, **kwargs):
+        kwargs.setdefault("default_response_class", FastJSONResponse)
         super().__init__(*args, **kwargs)
         self.config: Config = config
         self.debug: bool = config.server.debug
@@ -68,6 +95,23 @@ class SbugaFastAPI(FastAPI):
 
         self.pjsk_clients: dict[str, PJSKClient] = clients
 
+        self._gorgon_proc: subprocess.Popen | None = None
+        self._gorgon_watchdog_task: asyncio.Task | None = None
+        self.gorgon_restarts = 0
+        self.gorgon_healthy = False
+        # (region, canonical request, cached_data) -> the call everyone asking
+        # for it awaits
+        self._pjsk_inflight: dict[tuple, asyncio.Future] = {}
+        # region -> masterdata reload started by the data update loop
+        self._reload_tasks: dict[str, asyncio.Task] = {}
+        self._gorgon_started = asyncio.Event()
+
+        # clients whose on-disk masterdata is loaded but that aren't
+        # authenticated/synced yet - see master_client()
+        self.master_clients: dict[str, PJSKClient] = {}
+        # startup phase -> {"state", "seconds", "error"}
+        self.readiness: dict[str, dict] = {}
+
         # Exception handlers
         self.add_exception_handler(Exception, self.unhandled_exception_handler)
         self.add_exception_handler(
@@ -109,19 +153,26 @@ class SbugaFastAPI(FastAPI):
         self.s3_bucket = self.config.s3.bucket_name
         self.s3_asset_base_url = self.config.s3.base_url
 
-        psql_config = self.config.psql
-        self.db = await asyncpg.create_pool(
-            host=psql_config.host,
-            user=psql_config.user,
-            database=psql_config.database,
-            password=psql_config.password,
-            port=psql_config.port,
-            min_size=psql_config.pool_min_size,
-            max_size=psql_config.pool_max_size,
-            ssl="disable",  # XXX: todo, lazy for now
-        )
+        async with self._phase("db"):
+            psql_config = self.config.psql
+            self.db = await asyncpg.create_pool(
+                host=psql_config.host,
+                user=psql_config.user,
+                database=psql_config.database,
+                password=psql_config.password,
+                port=psql_config.port,
+                min_size=psql_config.pool_min_size,
+                max_size=psql_config.pool_max_size,
+                ssl="disable",  # XXX: todo, lazy for now
+            )
+
+        # everything past the DB is slow (the gorgon helper alone takes ~30s),
+        # so it warms up in the background while routes already serve what
+        # they can from disk
+        asyncio.create_task(self._bootstrap())
 
-        await self._start_gorgon_subprocess()
+    async def _bootstrap(self):
+        asyncio.create_task(self._start_gorgon())
         asyncio.create_task(self._set_en_pjsk_client())
         asyncio.create_task(self._set_jp_pjsk_client())
         asyncio.create_task(self._set_tw_pjsk_client())
@@ -130,6 +181,76 @@ class SbugaFastAPI(FastAPI):
         asyncio.create_task(self._periodic_update_check())
         asyncio.create_task(self._periodic_data_update_check())
 
+    @asynccontextmanager
+    async def _phase(self, name: str):
+        """Record a startup phase's state and duration in self.readiness."""
+        phase = self.readiness[name] = {
+            "state": "starting",
+            "seconds": None,
+            "error": None,
+        }
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            phase["state"] = "failed"
+            phase["error"] = repr(e)
+            print(f"Startup phase {name} failed: {e!r}")
+            raise
+        else:
+            phase["state"] = "ready"
+        finally:
+            phase["seconds"] = round(time.perf_counter() - start, 3)
+
+    async def _start_gorgon(self):
+        try:
+            async with self._phase("gorgon"):
+                await self._start_gorgon_subprocess()
+            self._gorgon_started.set()
+        except Exception:
+            pass  # the watchdog keeps respawning it; clients wait until it's up
+        finally:
+            self._gorgon_watchdog_task = asyncio.create_task(self._gorgon_watchdog())
+
+    def master_client(self, region: str) -> PJSKClient | None:
+        """The region's client for routes that only read masterdata/files on
+        disk: the live client, or during startup the one still authenticating
+        whose on-disk masterdata is already loaded."""
+        return self.pjsk_clients.get(region) or self.master_clients.get(region)
+
+    async def _new_client(self, region: str, get_version) -> PJSKClient:
+        """Create the region's client and serve the masterdata it has on disk
+        right away - that needs no upstream call - then look up the app
+        version it needs before it's started."""
+        client = PJSKClient(self, region, app_version=None, app_hash=None)
+        await self._serve_master_early(client)
+        data = await get_version()
+        client.app_version = data["app_version"]
+        client.app_hash = data["app_hash"]
+        client.ab_version = data.get("ab_version")
+        return client
+
+    @staticmethod
+    def slot_authenticator(region: str) -> Callable[[PJSKClient], Awaitable[None]]:
+        """What logs a region's clients in, slot by slot - PJSKClient wires it
+        up itself, so recreated clients get it too."""
+        if region in ("en", "jp"):
+            return authenticate_client
+        return lambda client: authenticate_client_row(client, quiet=True)
+
+    async def _serve_master_early(self, client: PJSKClient):
+        """Load the masterdata left on disk by the last run so master-only
+        routes work before the client is authenticated and synced."""
+        if read_data_version(client.data_path / "master") is None:
+            return  # first run, nothing to serve
+        async with self._phase(f"{client.region}.master"):
+            await client.reload_master()
+        self.master_clients[client.region] = client
+
+    async def _register_client(self, region: str, client: PJSKClient):
+        await set_client(region, client)
+        self.master_clients.pop(region, None)
+
     async def _client_ready(self):
         global _clients_ready
         async with _clients_ready_lock:
@@ -140,40 +261,70 @@ class SbugaFastAPI(FastAPI):
                 )
 
     async def _periodic_data_update_check(self):
-        """Check every region for data/asset updates each minute at :10
-        (1:10, 2:10, ...). Silent unless an update is found."""
+        """Check every region for data/asset updates about once a minute, each
+        region on its own schedule so a slow or failing one doesn't hold up
+        the others. Silent unless an update is found."""
+        await asyncio.gather(
+            *(self._data_update_loop(region) for region in ("en", "jp", "tw", "kr"))
+        )
+
+    async def _data_update_loop(self, region: str):
+        # spread regions (and workers) over the interval instead of all
+        # checking at the same second
+        await asyncio.sleep(random.uniform(0, DATA_CHECK_INTERVAL))
+        failures = 0
         while True:
-            now = time.time()
-            tick = (now // 60) * 60 + 10
-            if tick <= now:
-                tick += 60
-            await asyncio.sleep(tick - now)
-
-            needs_rebuild = False
-            for region in ("en", "jp", "tw", "kr"):
-                client = self.pjsk_clients.get(region)
-                if not client:
-                    continue
-                last_err = None
-                for attempt in range(3):
-                    try:
+            client = self.pjsk_clients.get(region)
+            if client:
+                try:
+                    with background_requests():
                         updated = await check_data_update(client)
-                        if updated and region in ("en", "jp"):
-                            needs_rebuild = True
-                        last_err = None
-                        break
-                    except Exception as e:
-                        last_err = e
-                        if attempt < 2:
-                            await asyncio.sleep(3)
-                if last_err is not None:
-                    print(f"[{region}] Update check failed after 3 tries: {last_err}")
-
-            if needs_rebuild:
-                jp = self.pjsk_clients.get("jp")
-                en = self.pjsk_clients.get("en")
-                if jp and en:
-                    asyncio.create_task(rebuild_maps(jp, en, self))
+                    if updated:
+                        # swap in the new masterdata off the request path;
+                        # fuzzy maps etc. rebuild via on_master_swap
+                        self._start_reload(region, client)
+                    if failures >= DATA_CHECK_REPORT_AFTER:
+                        print(f"[{region}] Update check recovered")
+                    failures = 0
+                except Exception as e:
+                    failures += 1
+                    if failures >= DATA_CHECK_REPORT_AFTER:
+                        print(
+                            f"[{region}] Update check failed {failures} times "
+                            f"in a row: {e}"
+                        )
+
+            # failing: quick retries (3s, 6s), then the interval doubling up
+            # to DATA_CHECK_MAX_INTERVAL until a check succeeds
+            if 0 < failures < DATA_CHECK_REPORT_AFTER:
+                delay = 3 * 2 ** (failures - 1)
+            else:
+                delay = min(
+                    DATA_CHECK_INTERVAL
+                    * 2 ** max(0, failures - DATA_CHECK_REPORT_AFTER),
+                    DATA_CHECK_MAX_INTERVAL,
+                )
+            await asyncio.sleep(
+                delay * random.uniform(1 - DATA_CHECK_JITTER, 1 + DATA_CHECK_JITTER)
+            )
+
+    def _start_reload(self, region: str, client: PJSKClient):
+        previous = self._reload_tasks.get(region)
+
+        async def _reload():
+            # one at a time - an update that landed mid-reload gets its own
+            if previous is not None and not previous.done():
+                await asyncio.wait([previous])
+            await client.reload_master()
+
+        def _done(fut: asyncio.Future):
+            if self._reload_tasks.get(region) is fut:
+                del self._reload_tasks[region]
+            if not fut.cancelled() and fut.exception():
+                print(f"[{region}] Masterdata reload failed: {fut.exception()!r}")
+
+        task = self._reload_tasks[region] = asyncio.create_task(_reload())
+        task.add_done_callback(_done)
 
     async def _periodic_update_check(self):
         await asyncio.sleep(60)
@@ -191,6 +342,7 @@ class SbugaFastAPI(FastAPI):
                         or data["app_hash"] != client.app_hash
                     ):
                         print(f"[{region}] Version changed, recreating client")
+                        region_metrics(region).incr("client_recreations")
                         from pjsk_api.requests.request_handling import _recreate_client
 
                         await _recreate_client(client, self)
@@ -203,61 +355,65 @@ class SbugaFastAPI(FastAPI):
                 client = self.pjsk_clients.get(region)
                 if not client or not client.is_authenticated:
                     continue
+                region_metrics(region).incr("reauths")
                 try:
                     await authenticate_client_row(client, quiet=True)
+                    save_sessions(client)
                 except Exception as e:
                     print(f"[{region}] Periodic ROW re-auth failed: {e}")
 
     async def _set_en_pjsk_client(self):
-        data = await get_en()
-        client = PJSKClient(
-            self,
-            "en",
-            app_version=data["app_version"],
-            app_hash=data["app_hash"],
-            ab_version=data.get("ab_version"),
-        )
+        async with self._phase("en"):
+            await self._start_en_pjsk_client()
+        await self._client_ready()
+
+    async def _start_en_pjsk_client(self):
+        client = await self._new_client("en", get_en)
+        await self._gorgon_started.wait()
         await client.start()
-        await authenticate_client(client)
+        if not restore_sessions(client):
+            await authenticate_client(client)
+            save_sessions(client)
         await ensure_updated_masterdata(client)
+        await client.reload_master()
         await ensure_updated_assetinfo(client)
         asyncio.create_task(download_and_process_assets(client))
-        await set_client("en", client)
-        await self._client_ready()
+        await self._register_client("en", client)
 
     async def _set_jp_pjsk_client(self):
-        data = await get_jp()
-        client = PJSKClient(
-            self,
-            "jp",
-            app_version=data["app_version"],
-            app_hash=data["app_hash"],
-            ab_version=data.get("ab_version"),
-        )
+        async with self._phase("jp"):
+            await self._start_jp_pjsk_client()
+        await self._client_ready()
+
+    async def _start_jp_pjsk_client(self):
+        client = await self._new_client("jp", get_jp)
+        await self._gorgon_started.wait()
         await client.start()
-        await authenticate_client(client)
+        if not restore_sessions(client):
+            await authenticate_client(client)
+            save_sessions(client)
         await ensure_updated_masterdata(client)
+        await client.reload_master()
         await ensure_updated_assetinfo(client)
         asyncio.create_task(download_and_process_assets(client))
-        await set_client("jp", client)
-        await self._client_ready()
+        await self._register_client("jp", client)
 
     async def _set_row_pjsk_client(self, region: str):
-        get_version = _get_version_fns[region]
-        data = await get_version()
-        client = PJSKClient(
-            self,
-            region,
-            app_version=data["app_version"],
-            app_hash=data["app_hash"],
-            ab_version=data.get("ab_version"),
-        )
+        async with self._phase(region):
+            await self._start_row_pjsk_client(region)
+
+    async def _start_row_pjsk_client(self, region: str):
+        client = await self._new_client(region, _get_version_fns[region])
+        await self._gorgon_started.wait()
         await client.start()
-        await authenticate_client_row(client)
+        if not restore_sessions(client):
+            await authenticate_client_row(client)
+            save_sessions(client)
         await ensure_updated_masterdata(client)
+        await client.reload_master()
         await ensure_updated_assetinfo(client)
         # asyncio.create_task(download_and_process_assets(client))
-        await set_client(region, client)
+        await self._register_client(region, client)
         # await self._client_ready()
 
     async def _set_tw_pjsk_client(self):
@@ -272,8 +428,87 @@ class SbugaFastAPI(FastAPI):
     async def pjsk_request(
         self, region: str, request: RequestData[T], cached_data: Optional[dict] = None
     ) -> Optional[T]:
-        return await request_with_retry(
-            self.pjsk_clients[region], request, cached_data=cached_data, app=self
+        region_metrics(region).incr("pjsk_requests")
+        breaker = region_breaker(region)
+        if breaker.is_open:
+            region_metrics(region).incr("breaker_rejected")
+            raise self._pjsk_unavailable(
+                ErrorDetailCode.PJSKMaintainence.value, cached_data
+            )
+
+        coalesce = request.coalesce
+        if coalesce is None:
+            coalesce = request.method.upper() == "GET"
+        key = PJSKClient.request_key(request) if coalesce else None
+        if key is None:
+            return await self._pjsk_request_unshared(region, request, cached_data)
+
+        # shared above the retries, so a failed call is recovered from (slot
+        # re-auth, client recreation) once rather than by every waiter
+        key = (region, key, id(cached_data))
+        shared = self._pjsk_inflight.get(key)
+        if shared is not None:
+            region_metrics(region).incr("coalesced_requests")
+        else:
+            shared = asyncio.ensure_future(
+                self._pjsk_request_unshared(region, request, cached_data)
+            )
+            self._pjsk_inflight[key] = shared
+
+            def _done(fut: asyncio.Future):
+                if self._pjsk_inflight.get(key) is fut:
+                    del self._pjsk_inflight[key]
+                if not fut.cancelled():
+                    fut.exception()  # mark retrieved even if every waiter left
+
+            shared.add_done_callback(_done)
+
+        # a waiter being cancelled must not cancel the call for everyone else
+        return await asyncio.shield(shared)
+
+    async def _pjsk_request_unshared(
+        self, region: str, request: RequestData[T], cached_data: Optional[dict]
+    ) -> Optional[T]:
+        breaker = region_breaker(region)
+        try:
+            with counting_retries():
+                result = await request_with_retry(
+                    self.pjsk_clients[region],
+                    request,
+                    cached_data=cached_data,
+                    app=self,
+                )
+        except RateLimited as e:
+            region_metrics(region).incr("rate_limited")
+            print(e)
+            raise self._pjsk_unavailable(
+                ErrorDetailCode.PJSKRateLimited.value, cached_data
+            )
+        except Exception as e:
+            if is_outage(e):
+                breaker.record_failure(lambda: self._breaker_probe(region))
+            raise
+
+        breaker.record_success()
+        return result
+
+    async def _breaker_probe(self, region: str):
+        """Fetch the client's own profile: a GET that is safe to repeat, unlike
+        whatever user request happened to trip the breaker."""
+        client = self.pjsk_clients[region]
+        req = profile_request(client, client._slots[0].user_id)
+        req.priority = RequestPriority.BACKGROUND
+        await client.request(req)
+
+    @staticmethod
+    def _pjsk_unavailable(detail: str, cached_data) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=(
+                {"detail": detail, "cached_data": cached_data}
+                if cached_data
+                else detail
+            ),
         )
 
     @asynccontextmanager
@@ -297,7 +532,7 @@ class SbugaFastAPI(FastAPI):
             content = {"detail": detail}
             if cached_data is not None:
                 content["cached_data"] = cached_data
-            return JSONResponse(content=content, status_code=exc.status_code)
+            return FastJSONResponse(content=content, status_code=exc.status_code)
         else:
             if self.debug:
                 raise exc
@@ -310,14 +545,14 @@ class SbugaFastAPI(FastAPI):
             }
             if cached_data is not None:
                 content["cached_data"] = cached_data
-            return JSONResponse(content=content, status_code=exc.status_code)
+            return FastJSONResponse(content=content, status_code=exc.status_code)
 
     async def validation_exception_handler(
         self, request: Request, exc: RequestValidationError
     ):
         if self.debug:
             raise exc
-        return JSONResponse(
+        return FastJSONResponse(
             content={"detail": ErrorDetailCode.BadRequestFields.value},
             status_code=400,
         )
@@ -325,7 +560,7 @@ class SbugaFastAPI(FastAPI):
     async def unhandled_exception_handler(self, request: Request, exc: Exception):
         if self.debug:
             raise exc
-        return JSONResponse(
+        return FastJSONResponse(
             content={"detail": ErrorDetailCode.InternalServerError.value},
             status_code=500,
         )
@@ -334,9 +569,17 @@ class SbugaFastAPI(FastAPI):
         from pjsk_api.asset_handlers.process import shutdown_extract_executor
 
         shutdown_extract_executor()
+        shutdown_process_pool()
+        if self._gorgon_watchdog_task:
+            self._gorgon_watchdog_task.cancel()
+        for task in list(self._reload_tasks.values()):
+            task.cancel()
         for client in self.pjsk_clients.values():
             if client:
                 await client.close()
+        for region, client in self.master_clients.items():
+            if self.pjsk_clients.get(region) is not client:
+                await client.close()
         try:
             self._gorgon_proc.kill()
         except:
@@ -407,6 +650,7 @@ class SbugaFastAPI(FastAPI):
                 ),
             )
             self._gorgon_proc = proc
+            self.gorgon_healthy = False
 
             print("Waiting for gorgon header helper")
             # the helper imports androidemu before binding, which takes ~30s+
@@ -422,4 +666,52 @@ class SbugaFastAPI(FastAPI):
                 proc.kill()  # don't leave the half-started helper orphaned
                 raise RuntimeError("Gorgon header subprocess did not start in time")
 
+        self.gorgon_healthy = True
         print("Gorgon header subprocess started")
+
+    async def _gorgon_watchdog(self):
+        """Respawn the signing helper if it exits or stops answering.
+
+        Only an unhealthy port counts: if our process died because another
+        helper holds 5001 and answers, signing works and nothing is done."""
+        failed = 0
+        timeout = aiohttp.ClientTimeout(total=5)
+        async with aiohttp.ClientSession() as cs:
+            while True:
+                await asyncio.sleep(GORGON_CHECK_INTERVAL)
+                try:
+                    async with cs.get(GORGON_URL, timeout=timeout) as resp:
+                        self.gorgon_healthy = resp.status == 200
+                except Exception:
+                    self.gorgon_healthy = False
+                if self.gorgon_healthy:
+                    failed = 0
+                    if not self._gorgon_started.is_set():
+                        # the first start failed and a respawn (or another
+                        # helper on the port) got it up - let clients start
+                        self.readiness["gorgon"]["state"] = "ready"
+                        self._gorgon_started.set()
+                    continue
+
+                failed += 1
+                exited = (
+                    self._gorgon_proc is None or self._gorgon_proc.poll() is not None
+                )
+                if not exited and failed < GORGON_MAX_FAILED_CHECKS:
+                    continue
+
+                print(
+                    "Gorgon header helper "
+                    + ("exited" if exited else f"failed {failed} health checks")
+                    + ", respawning"
+                )
+                if not exited:
+                    self._gorgon_proc.kill()
+                    await asyncio.to_thread(self._gorgon_proc.wait)
+                try:
+                    await self._start_gorgon_subprocess()
+                    self.gorgon_restarts += 1
+                    failed = 0
+                except Exception as e:
+                    # retried on the next check, the dead process counts as exited
+                    print(f"Gorgon header helper respawn failed: {e}")
@@ -11,8 +11,24 @@ class ServerConfig(BaseModel):
     debug: bool
 
 
+class RateLimitConfig(BaseModel):
+    rate: float = Field(gt=0)  # requests per second
+    burst: int = Field(gt=0)
+
+
 class PJSKConfig(BaseModel):
     hide_leaks: bool = Field(alias="hide-leaks")
+    # serve masterdata from mmap'd segments shared by all workers instead of
+    # parsing it into every worker
+    shared_master: bool = Field(False, alias="shared-master")
+    # game accounts (request slots) per region; the pool grows towards
+    # max-users while requests queue for slots and shrinks back when idle
+    min_users: int = Field(5, alias="min-users")
+    max_users: int = Field(5, alias="max-users")
+    # region ("*" for all) -> path class -> budget; empty means unlimited
+    rate_limits: dict[str, dict[str, RateLimitConfig]] = Field(
+        default_factory=dict, alias="rate-limits"
+    )
 
 
 class PSQLConfig(BaseModel):
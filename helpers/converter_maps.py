@@ -7,6 +7,7 @@ import database
 
 from helpers.fuzzy_matcher import preprocess
 from pjsk_api.client import PJSKClient
+from pjsk_api.master import MasterSnapshot, MasterTable, on_master_swap
 
 from typing import TYPE_CHECKING
 
@@ -36,12 +37,23 @@ def _make_romanizer(katsu: cutlet.Cutlet):
 ROMANIZERS = [_make_romanizer(k) for k in _KATSU]
 
 _song_maps: dict[str, dict[str, tuple[int, frozenset[str]]]] = {"jp": {}, "en": {}}
+_song_maps_generation = 0  # bumped on every change, for caches built from the maps
 _character_map: dict[str, int] = {}
 _event_maps: dict[str, dict[str, int]] = {"jp": {}, "en": {}}
 
 _build_lock = asyncio.Lock()
 
 
+def _bump_song_maps():
+    global _song_maps_generation
+    _song_maps_generation += 1
+
+
+def song_maps_generation() -> int:
+    """Changes whenever the song maps (and so title variants) do."""
+    return _song_maps_generation
+
+
 async def get_song_aliases(app: SbugaFastAPI) -> dict[str, int]:
     async with app.acquire_db() as conn:
         rows: list[database.models.SongAlias] = await conn.fetch(
@@ -136,11 +148,11 @@ async def _build_song_maps(
     jp_ids = {m["id"] for m in jp_musics}
     en_ids = {m["id"] for m in en_musics}
 
-    def _diff_map(difficulties: list) -> dict[int, frozenset[str]]:
-        result: dict[int, set[str]] = {}
-        for d in difficulties:
-            result.setdefault(d["musicId"], set()).add(d["musicDifficulty"])
-        return {k: frozenset(v) for k, v in result.items()}
+    def _diff_map(difficulties: MasterTable) -> dict[int, frozenset[str]]:
+        return {
+            music_id: frozenset(d["musicDifficulty"] for d in rows)
+            for music_id, rows in difficulties.grouped("musicId").items()
+        }
 
     jp_diff_map = _diff_map(jp_difficulties)
     en_diff_map = _diff_map(en_difficulties)
@@ -181,6 +193,7 @@ async def _build_song_maps(
 
     _song_maps["jp"] = new_jp
     _song_maps["en"] = new_en
+    _bump_song_maps()
 
 
 async def _build_event_map(jp_client: PJSKClient, en_client: PJSKClient, app) -> None:
@@ -279,6 +292,28 @@ async def rebuild_maps(
         )
 
 
+# masterdata the maps are built from
+_MAP_SOURCES = (
+    "musics",
+    "musicDifficulties",
+    "events",
+    "gameCharacters",
+    "outsideCharacters",
+)
+
+
+@on_master_swap
+async def _rebuild_on_master_swap(
+    client: PJSKClient, old: MasterSnapshot, new: MasterSnapshot
+) -> None:
+    if client.region not in ("jp", "en") or not new.touches(_MAP_SOURCES):
+        return
+    jp = client.app.pjsk_clients.get("jp")
+    en = client.app.pjsk_clients.get("en")
+    if jp and en:
+        await rebuild_maps(jp, en, client.app)
+
+
 def add_song_alias(
     alias: str,
     music_id: int,
@@ -293,6 +328,7 @@ def add_song_alias(
         )
         for key in _romanize_alias(alias):
             mapping[key] = (music_id, diffs)
+    _bump_song_maps()
 
 
 def add_event_alias(
@@ -316,6 +352,7 @@ def remove_song_alias(
         mapping = _song_maps.get(r, {})
         for key in _romanize_alias(alias):
             mapping.pop(key, None)
+    _bump_song_maps()
 
 
 def remove_event_alias(
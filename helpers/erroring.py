@@ -32,6 +32,7 @@ class ErrorDetailCode(StrEnum):
     AliasTaken = "alias_taken"
 
     PJSKMaintainence = "maintainence_pjsk"
+    PJSKRateLimited = "ratelimited_pjsk"
     PJSKClientUnavailable = "pjsk_region_unavailable"
 
 
@@ -61,7 +62,7 @@ COMMON_RESPONSES = {
         **ERROR_RESPONSE,
     },
     503: {
-        "description": f"PJSK requesting unavailable or in maintenance. (`{ErrorDetailCode.PJSKMaintainence}`, `{ErrorDetailCode.PJSKClientUnavailable}`)",
+        "description": f"PJSK requesting unavailable, in maintenance or over our request budget. (`{ErrorDetailCode.PJSKMaintainence}`, `{ErrorDetailCode.PJSKClientUnavailable}`, `{ErrorDetailCode.PJSKRateLimited}`)",
         **ERROR_RESPONSE,
     },
 }
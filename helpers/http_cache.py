@@ -0,0 +1,89 @@
+import hashlib
+import time
+from typing import Hashable, Iterable
+
+from fastapi import Request, Response, status
+
+from helpers.compiled_cache import CompiledResponse
+from pjsk_api.master import MasterSnapshot
+
+# how long clients/CDNs may reuse a response without revalidating (seconds);
+# revalidating is a cheap 304 while the data hasn't changed
+MAX_AGE = 60
+STALE_WHILE_REVALIDATE = 300
+
+
+def make_etag(*parts: Hashable) -> str:
+    """Strong ETag for a response fully determined by `parts`."""
+    digest = hashlib.sha256(repr(parts).encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def master_etag(master: MasterSnapshot, files: Iterable[str], *params: Hashable) -> str:
+    """ETag for a response built from masterdata `files` of one snapshot.
+
+    Uses the files' content hashes when the manifest has them, so a data update
+    that doesn't touch `files` keeps the ETag; otherwise the dataVersion."""
+    hashes = master.hashes or {}
+    versions = tuple(hashes.get(file) or master.data_version for file in files)
+    return make_etag(versions, *params)
+
+
+def cache_control(valid_until: float | None = None) -> str:
+    """Cache-Control for a response that goes stale at `valid_until` (unix
+    seconds, e.g. a hidden leak getting published) or on the next data update."""
+    max_age = MAX_AGE
+    if valid_until is not None:
+        max_age = max(0, min(max_age, int(valid_until - time.time())))
+    return f"public, max-age={max_age}, stale-while-revalidate={STALE_WHILE_REVALIDATE}"
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so W/"x" matches "x"
+    # (CDNs weaken ETags when they compress)
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def not_modified(
+    request: Request, etag: str, valid_until: float | None = None
+) -> Response | None:
+    """A 304 if the client already has `etag`, else None."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match or not _matches(if_none_match, etag):
+        return None
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers=cache_headers(etag, valid_until),
+    )
+
+
+def cache_headers(etag: str, valid_until: float | None = None) -> dict[str, str]:
+    return {"ETag": etag, "Cache-Control": cache_control(valid_until)}
+
+
+def compiled_response(request: Request, compiled: CompiledResponse) -> Response:
+    """Serve a compiled response in the encoding the client accepts, with its
+    ETag (from the hash of its body) and conditional GET."""
+    encoding, body = compiled.variant(request.headers.get("accept-encoding", ""))
+    etag = f'"{compiled.digest[:32]}"'
+    if encoding:
+        # each encoding is a different representation, so needs its own ETag
+        etag = f'{etag[:-1]}-{encoding}"'
+    headers = cache_headers(etag, compiled.valid_until)
+    if compiled.encoded:
+        headers["Vary"] = "Accept-Encoding"
+
+    if cached := not_modified(request, etag, compiled.valid_until):
+        cached.headers.update(headers)
+        return cached
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
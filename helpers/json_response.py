@@ -0,0 +1,52 @@
+import json
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # stdlib json (slower, same output)
+    orjson = None
+
+if orjson is not None:
+    # int keys become strings like the stdlib does
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def _stdlib_dumps(content: Any) -> bytes:
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+        default=jsonable_encoder,
+    ).encode("utf-8")
+
+
+def dumps(content: Any) -> bytes:
+    """Compact UTF-8 JSON, as JSONResponse renders it. Anything json can't
+    encode natively (models, LazyModels...) goes through jsonable_encoder."""
+    if orjson is None:
+        return _stdlib_dumps(content)
+    try:
+        return orjson.dumps(content, default=jsonable_encoder, option=_ORJSON_OPTIONS)
+    except orjson.JSONEncodeError:
+        # e.g. ints past 64 bits, which only the stdlib encodes
+        return _stdlib_dumps(content)
+
+
+class FastJSONResponse(JSONResponse):
+    """SbugaFastAPI's default response class: JSON encoded with orjson.
+
+    Only the final encoding gets faster. A route that returns a dict or model
+    still goes through FastAPI's jsonable_encoder (and its response_model
+    validation) before this renders it; only a route that constructs and
+    returns the response itself, as current_event does, skips that pass.
+    Content that is already encoded (bytes) is sent as is."""
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, (bytes, bytearray, memoryview)):
+            return bytes(content)
+        return dumps(content)
@@ -0,0 +1,98 @@
+import asyncio
+import time
+
+from fastapi import HTTPException, status
+
+from helpers.erroring import ErrorDetailCode
+from pjsk_api.client import RequestPriority
+from pjsk_api.requests.profile import profile_request
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from core import SbugaFastAPI
+
+cached: dict[str, dict] = {}  # key: "{region}:{user_id}"
+locks: dict[str, asyncio.Lock] = {}
+CACHE_TTL = 300
+FRESH_TTL = 10  # floor for fresh=true requests so one profile can't be hammered
+
+
+def get_lock(key: str) -> asyncio.Lock:
+    if key not in locks:
+        locks[key] = asyncio.Lock()
+    return locks[key]
+
+
+def cleanup_cache():
+    now = time.time()
+    expired = [k for k, v in cached.items() if v.get("updated", 0) + CACHE_TTL < now]
+    for k in expired:
+        cached.pop(k, None)
+        locks.pop(k, None)
+
+
+def get_cached_profile(region: str, user_id: int, fresh: bool = False) -> dict | None:
+    prev = cached.get(f"{region}:{user_id}")
+    ttl = FRESH_TTL if fresh else CACHE_TTL
+    if prev and prev.get("updated", 0) + ttl > time.time():
+        return prev
+    return None
+
+
+async def fetch_profile(
+    app: "SbugaFastAPI",
+    region: str,
+    user_id: int,
+    fresh: bool = False,
+    priority: RequestPriority = RequestPriority.NORMAL,
+) -> dict:
+    """Cached profile (see CACHE_TTL / FRESH_TTL) or a fetched one. Concurrent
+    callers for the same profile share one upstream request."""
+    cache_key = f"{region}:{user_id}"
+
+    prev = get_cached_profile(region, user_id, fresh)
+    if prev:
+        return prev
+
+    async with get_lock(cache_key):
+        prev = get_cached_profile(region, user_id, fresh)
+        if prev:
+            return prev
+
+        client = app.pjsk_clients.get(region)
+        if not client:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=ErrorDetailCode.PJSKClientUnavailable.value,
+            )
+
+        req = profile_request(client, user_id)
+        req.priority = priority
+        if fresh:
+            # someone is waiting on this one (e.g. account-link verification)
+            req.priority = RequestPriority.INTERACTIVE
+        try:
+            profile = await app.pjsk_request(region, req)
+        except HTTPException as e:
+            if e.status_code == 404:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=ErrorDetailCode.NotFound.value,
+                )
+            stale = cached.get(cache_key)
+            if stale and e.status_code >= 500 and isinstance(e.detail, str):
+                # upstream is down - hand back the last profile we had
+                raise HTTPException(
+                    status_code=e.status_code,
+                    detail={"detail": e.detail, "cached_data": stale},
+                )
+            raise e
+        updated = time.time()
+        data = {
+            "updated": updated,
+            "next_available_update": updated + CACHE_TTL,
+            "profile": profile,
+        }
+        cached[cache_key] = data
+        return data
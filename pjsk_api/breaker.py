@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable
+
+import aiohttp
+from fastapi import HTTPException
+
+FAILURE_THRESHOLD = 5  # consecutive outage-looking failures that open the circuit
+PROBE_DELAY = 30  # seconds before the first probe once open
+MAX_PROBE_DELAY = 300  # probes back off (doubling) up to this
+
+
+def is_outage(e: BaseException) -> bool:
+    """Errors that mean upstream is down/in maintenance (not that the request
+    was bad)."""
+    if isinstance(e, HTTPException):
+        return e.status_code >= 500
+    if isinstance(e, aiohttp.ClientResponseError):
+        return e.status >= 500
+    return isinstance(e, (asyncio.TimeoutError, aiohttp.ClientConnectionError))
+
+
+class CircuitBreaker:
+    """closed -> (FAILURE_THRESHOLD failures in a row) -> open. While open every
+    request fails immediately, and a background task runs `probe` (a fixed,
+    idempotent request), backing off, until one succeeds, which closes the
+    circuit again."""
+
+    def __init__(self, region: str):
+        self.region = region
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.probes = 0
+        self._probe_task: asyncio.Task | None = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def record_success(self):
+        self.failures = 0
+        if self.is_open:
+            self._close()
+
+    def record_failure(self, probe: Callable[[], Awaitable[Any]]):
+        self.failures += 1
+        if self.is_open or self.failures < FAILURE_THRESHOLD:
+            return
+        self.opened_at = time.time()
+        self.probes = 0
+        print(f"[{self.region}] PJSK circuit open after {self.failures} failures")
+        self._probe_task = asyncio.create_task(self._probe_until_closed(probe))
+
+    def _close(self):
+        print(
+            f"[{self.region}] PJSK circuit closed after "
+            f"{time.time() - self.opened_at:.0f}s"
+        )
+        self.opened_at = None
+        self.failures = 0
+        if self._probe_task and self._probe_task is not asyncio.current_task():
+            self._probe_task.cancel()
+        self._probe_task = None
+
+    async def _probe_until_closed(self, probe: Callable[[], Awaitable[Any]]):
+        delay = PROBE_DELAY
+        while self.is_open:
+            await asyncio.sleep(delay)
+            self.probes += 1
+            try:
+                await probe()
+            except Exception as e:
+                # only a successful probe proves upstream is back - a missing
+                # client or an exhausted rate budget says nothing about it
+                if not is_outage(e):
+                    print(f"[{self.region}] PJSK circuit probe failed: {e!r}")
+                delay = min(delay * 2, MAX_PROBE_DELAY)
+                continue
+            self._close()
+
+    def snapshot(self) -> dict:
+        return {
+            "open": self.is_open,
+            "open_for": time.time() - self.opened_at if self.is_open else None,
+            "failures": self.failures,
+            "probes": self.probes,
+        }
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+
+
+def region_breaker(region: str) -> CircuitBreaker:
+    breaker = _breakers.get(region)
+    if breaker is None:
+        breaker = _breakers[region] = CircuitBreaker(region)
+    return breaker
+
+
+def breakers_snapshot() -> dict[str, dict]:
+    return {region: breaker.snapshot() for region, breaker in _breakers.items()}
@@ -1,16 +1,44 @@
 from __future__ import annotations
 import aiohttp
-import json
-import aiofiles
 import asyncio
+import copy
+import heapq
+import itertools
+import time
 from msgpack import unpackb, packb
 from pjsk_api.crypto import encrypt, decrypt
 from pjsk_api.constants import keys, REGION_ROW
 from pjsk_api.nuverse_masterdata.process_row_json import nuverse_api_restorer
-from typing import Any, Optional, Type, TypeVar, Generic, TYPE_CHECKING
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Optional,
+    Type,
+    TypeVar,
+    Generic,
+    TYPE_CHECKING,
+)
 from pydantic import BaseModel
+from dataclasses import dataclass, fields, replace
+from contextlib import contextmanager
+from contextvars import ContextVar
 from pathlib import Path
+from enum import IntEnum
+from .governor import RateGovernor, region_governor
+from .lazy import LazyModel
+from .metrics import region_metrics
 from .models import SekaiUserAuthData
+from .sessions import release_session_file, save_sessions
+from .unpack import unpack_yielding
+from .master import (
+    MasterSnapshot,
+    notify_master_swap,
+    read_data_version,
+    update_manifest,
+    run_in_process,
+    write_binary_snapshots,
+)
 
 if TYPE_CHECKING:
     from core import SbugaFastAPI
@@ -23,8 +51,68 @@ APP_PLATFORM_NAMES = {
 MAX_USERS = 25
 T = TypeVar("T", bound=BaseModel)
 
+# slot pool autoscaling (only when max_users > num_users)
+SCALE_INTERVAL = 30  # seconds between sizing decisions
+SCALE_UP_WAIT = 0.25  # average slot wait (s) over an interval that adds a slot
+SCALE_DOWN_IDLE_TICKS = 10  # intervals with nobody waiting before dropping one
+
+# responses at least this big are decrypted on the app executor and unpacked
+# in slices that yield to the loop (leaderboards, borders, masterdata...)
+UNPACK_OFFLOAD_BYTES = 256 * 1024
+
+
+class RequestPriority(IntEnum):
+    """Slot priority - lower goes first."""
+
+    INTERACTIVE = 0  # someone is waiting on this specific call (e.g. fresh=true)
+    NORMAL = 1
+    BACKGROUND = 2  # refreshes/maintenance, can't take the reserved slots
+
+
+# set by background_requests(): requests made inside run at BACKGROUND priority
+_background_work: ContextVar[bool] = ContextVar("pjsk_background_work", default=False)
+
+
+@contextmanager
+def background_requests():
+    """Run PJSK requests made inside this block (and tasks it starts) at
+    BACKGROUND priority - for work nobody is waiting on, like update checks,
+    whose requests are built where their priority can't be set."""
+    token = _background_work.set(True)
+    try:
+        yield
+    finally:
+        _background_work.reset(token)
+
+
+# set by counting_retries(): path -> upstream attempts made for it so far
+_attempts: ContextVar[dict[str, int] | None] = ContextVar("pjsk_attempts", default=None)
+
+
+@contextmanager
+def counting_retries():
+    """Count every request made inside this block after the first for the same
+    path as a retry (the `retries` counter) - wraps one call's retry loop."""
+    token = _attempts.set({})
+    try:
+        yield
+    finally:
+        _attempts.reset(token)
+
+
+# longest a request queues for rate budget before failing fast (seconds)
+RATE_MAX_WAIT = {
+    RequestPriority.INTERACTIVE: 5,
+    RequestPriority.NORMAL: 10,
+    RequestPriority.BACKGROUND: 60,
+}
+
+
+@dataclass(slots=True, kw_only=True)
+class RequestData(Generic[T]):
+    """Describes one upstream call. A plain dataclass - one is built per
+    outbound request, so it skips pydantic's validation."""
 
-class RequestData(BaseModel, Generic[T]):
     base_url: str
     path: str
     method: str = "GET"
@@ -32,12 +120,31 @@ class RequestData(BaseModel, Generic[T]):
     headers: Optional[dict] = None
     params: Optional[dict] = None
     response_model: Optional[Type[T]] = None
+    # validate response_model fields on first access (returns a LazyModel)
+    # instead of the whole response up front - for big responses callers only
+    # read a part of
+    lazy: bool = False
 
     trailing_slash: bool = (
         False  # because VERY rarely, some routes have a trailing slash (don't ask me lol)
     )
+    # share one call (retries included) between concurrent identical requests
+    # made through SbugaFastAPI.pjsk_request. None: only GETs do - other
+    # methods change state upstream, so each caller's call has to happen. the
+    # result object is shared too, so turn this off for calls whose results get
+    # mutated
+    coalesce: Optional[bool] = None
+    priority: RequestPriority = RequestPriority.NORMAL
 
-    model_config = {"arbitrary_types_allowed": True}
+    # same calls as the pydantic model this used to be
+    def model_copy(
+        self, *, update: dict | None = None, deep: bool = False
+    ) -> RequestData[T]:
+        copied = replace(self, **(update or {}))
+        return copy.deepcopy(copied) if deep else copied
+
+    def model_dump(self) -> dict:
+        return {field.name: getattr(self, field.name) for field in fields(self)}
 
 
 class UserSlot:
@@ -47,6 +154,7 @@ class UserSlot:
         self.user_id: int | None = None
         self.credential: str | None = None
         self.in_use: bool = False
+        self.restored: bool = False  # session loaded from disk, not yet proven
 
 
 class PJSKClient:
@@ -54,13 +162,17 @@ class PJSKClient:
         self,
         app: SbugaFastAPI,
         region: str,
-        app_version: str,
-        app_hash: str,
+        app_version: str | None,  # may be filled in later, before start()
+        app_hash: str | None,
         app_platform: str = "android",
         unity_version: str = "2022.3.62f2",
-        num_users: int = 5,
+        num_users: int | None = None,
         ab_version: str | None = None,
+        max_users: int | None = None,
     ):
+        """num_users/max_users default to pjsk.min-users/max-users, so every
+        client - including one recreated after a version bump - gets the
+        configured pool."""
         self.app: SbugaFastAPI = app
 
         self.region = region
@@ -69,7 +181,29 @@ class PJSKClient:
         self.app_platform = app_platform
         self.unity_version = unity_version
         self.ab_version = ab_version  # used for ROW servers
+        if num_users is None:
+            num_users = app.config.pjsk.min_users
+        if max_users is None:
+            max_users = app.config.pjsk.max_users
         self.num_users = min(max(1, num_users), MAX_USERS)
+        # the pool grows up to max_users under sustained slot waits and shrinks
+        # back to the starting size when idle
+        self.min_users = self.num_users
+        self.max_users = min(max(self.num_users, max_users or 0), MAX_USERS)
+        # authenticates every slot of the client it's given; needed before new
+        # slots can be added and to recover from a rejected saved session
+        self.slot_authenticator: Callable[[PJSKClient], Awaitable[None]] | None = (
+            app.slot_authenticator(region)
+        )
+        # (user_id, credential) of slots the pool shrank away, logged in again
+        # by the next slots added instead of new accounts
+        self._spare_logins: list[tuple[int, str | None]] = []
+        self._scale_task: asyncio.Task | None = None
+        self._reauth_task: asyncio.Task | None = None
+
+        # per-worker persisted sessions (see pjsk_api.sessions)
+        self._session_file: Path | None = None
+        self._session_lock = None
 
         self.is_authenticated: bool = False
         self.got_426: bool = False
@@ -77,15 +211,30 @@ class PJSKClient:
         self.data_path: Path = Path("pjsk_api") / "data" / region
         self.data_path.mkdir(parents=True, exist_ok=True)
 
-        self.master_cache: dict[str, Any] = {}
+        self.master: MasterSnapshot = MasterSnapshot(
+            self.data_path / "master",
+            read_data_version(self.data_path / "master"),
+            shared=app.config.pjsk.shared_master,
+        )
+        self._master_reload_lock: asyncio.Lock = asyncio.Lock()
 
         self._slots: list[UserSlot] = [UserSlot() for _ in range(self.num_users)]
-        self._slot_semaphore: asyncio.Semaphore = asyncio.Semaphore(self.num_users)
-        self._slot_lock: asyncio.Lock = asyncio.Lock()
+        # heap of (priority, seq, future) waiting for a slot
+        self._slot_waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._slot_waiter_seq = itertools.count()
+        # priority name -> [count, total wait, max wait] (seconds)
+        self._slot_wait_totals: dict[str, list[float]] = {
+            p.name.lower(): [0, 0.0, 0.0] for p in RequestPriority
+        }
+        self._scale_window: list[float] = [0, 0.0]  # [count, total wait] this interval
 
         # shared headers applied to all slots
         self._shared_headers: dict[str, str] = {}
 
+        self.governor: RateGovernor = region_governor(
+            region, app.config.pjsk.rate_limits
+        )
+
     @property
     def keyset(self):
         return keys[self.region]
@@ -113,31 +262,191 @@ class PJSKClient:
             if slot.session:
                 slot.session._default_headers.update(headers)
 
+    def _new_session(self) -> aiohttp.ClientSession:
+        return aiohttp.ClientSession(
+            headers={**self.default_headers, **self._shared_headers},
+            connector=aiohttp.TCPConnector(limit=1),
+        )
+
     async def start(self):
         for slot in self._slots:
-            slot.session = aiohttp.ClientSession(
-                headers={**self.default_headers, **self._shared_headers},
-                connector=aiohttp.TCPConnector(limit=1),
-            )
+            slot.session = self._new_session()
+        if self.max_users > self.min_users:
+            self._scale_task = asyncio.create_task(self._autoscale())
 
     async def close(self):
+        if self._scale_task:
+            self._scale_task.cancel()
+            self._scale_task = None
+        try:
+            save_sessions(self)  # tokens rotate per response - keep the latest
+        except OSError as e:
+            print(f"[{self.region}] Failed to save sessions: {e}")
+        release_session_file(self)
         for slot in self._slots:
             if slot.session:
                 await slot.session.close()
                 slot.session = None
 
-    async def _acquire_slot(self) -> UserSlot:
-        await self._slot_semaphore.acquire()
-        async with self._slot_lock:
-            for slot in self._slots:
-                if not slot.in_use:
-                    slot.in_use = True
-                    return slot
-        raise RuntimeError("No available slots despite semaphore.")
+    @property
+    def reserved_slots(self) -> int:
+        """Free slots background work has to leave for interactive/normal
+        traffic - never all of them, or background work could never run."""
+        return min(max(1, self.num_users // 5), self.num_users - 1)
+
+    def _take_free_slot(self, priority: int) -> UserSlot | None:
+        free = [slot for slot in self._slots if not slot.in_use]
+        reserve = self.reserved_slots if priority >= RequestPriority.BACKGROUND else 0
+        if len(free) <= reserve:
+            return None
+        free[0].in_use = True
+        return free[0]
+
+    def _dispatch_slots(self):
+        """Hand free slots to waiters, highest priority (then oldest) first."""
+        while self._slot_waiters:
+            priority, _, fut = self._slot_waiters[0]
+            if fut.done():  # waiter gave up
+                heapq.heappop(self._slot_waiters)
+                continue
+            slot = self._take_free_slot(priority)
+            if slot is None:
+                break  # reserves only grow with lower priority, so nobody else fits
+            heapq.heappop(self._slot_waiters)
+            fut.set_result(slot)
+
+    async def _acquire_slot(
+        self, priority: RequestPriority = RequestPriority.NORMAL
+    ) -> UserSlot:
+        start = time.monotonic()
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._slot_waiters, (priority, next(self._slot_waiter_seq), fut))
+        self._dispatch_slots()
+        try:
+            slot = await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self._release_slot(fut.result())
+            raise
+
+        waited = time.monotonic() - start
+        totals = self._slot_wait_totals[RequestPriority(priority).name.lower()]
+        totals[0] += 1
+        totals[1] += waited
+        totals[2] = max(totals[2], waited)
+        self._scale_window[0] += 1
+        self._scale_window[1] += waited
+        return slot
 
     def _release_slot(self, slot: UserSlot):
         slot.in_use = False
-        self._slot_semaphore.release()
+        self._dispatch_slots()
+
+    def slot_wait_times(self) -> dict[str, dict]:
+        """Per-priority slot wait so far: count, average and max (ms), queued now."""
+        queued = {p.name.lower(): 0 for p in RequestPriority}
+        for priority, _, fut in self._slot_waiters:
+            if not fut.done():
+                queued[RequestPriority(priority).name.lower()] += 1
+        return {
+            name: {
+                "count": int(count),
+                "avg_ms": total / count * 1000 if count else 0.0,
+                "max_ms": max_wait * 1000,
+                "queued": queued[name],
+            }
+            for name, (count, total, max_wait) in self._slot_wait_totals.items()
+        }
+
+    def _pool_of(self, slots: list[UserSlot]) -> PJSKClient:
+        """A copy of this client that only sees `slots` (with its own slot
+        queue), so they can be authenticated without touching the rest."""
+        view = copy.copy(self)
+        view._slots = slots
+        view.num_users = len(slots)
+        view._slot_waiters = []
+        return view
+
+    async def _add_slot(self) -> None:
+        slot = UserSlot()
+        slot.session = self._new_session()
+        if self._spare_logins:
+            slot.user_id, slot.credential = self._spare_logins.pop()
+        region_metrics(self.region).incr("slots_added")
+        try:
+            # only the new slot logs in; it joins the pool once it's usable
+            await self.slot_authenticator(self._pool_of([slot]))
+        except Exception as e:
+            print(f"[{self.region}] Failed to authenticate new slot: {e}")
+            await slot.session.close()
+            if slot.user_id is not None:
+                self._spare_logins.append((slot.user_id, slot.credential))
+            return
+        self._slots.append(slot)
+        self.num_users += 1
+        try:
+            save_sessions(self)
+        except OSError as e:
+            print(f"[{self.region}] Failed to save sessions: {e}")
+        print(f"[{self.region}] Slot pool grew to {self.num_users}")
+        self._dispatch_slots()
+
+    async def _remove_idle_slot(self) -> None:
+        slot = next((s for s in reversed(self._slots) if not s.in_use), None)
+        if slot is None:
+            return
+        self._slots.remove(slot)
+        self.num_users -= 1
+        await slot.session.close()
+        if slot.user_id is not None:
+            self._spare_logins.append((slot.user_id, slot.credential))
+        try:
+            save_sessions(self)
+        except OSError as e:
+            print(f"[{self.region}] Failed to save sessions: {e}")
+        print(f"[{self.region}] Slot pool shrank to {self.num_users}")
+
+    async def _autoscale(self):
+        idle_ticks = 0
+        while True:
+            await asyncio.sleep(SCALE_INTERVAL)
+            count, total = self._scale_window
+            self._scale_window = [0, 0.0]
+            queued = any(not fut.done() for _, _, fut in self._slot_waiters)
+            avg_wait = total / count if count else 0.0
+
+            if (avg_wait > SCALE_UP_WAIT or queued) and self.num_users < self.max_users:
+                idle_ticks = 0
+                if self.slot_authenticator and self.is_authenticated:
+                    # next decision only once the new slot is usable
+                    await self._add_slot()
+                continue
+
+            idle_ticks = idle_ticks + 1 if not queued and avg_wait < 0.01 else 0
+            if idle_ticks >= SCALE_DOWN_IDLE_TICKS and self.num_users > self.min_users:
+                idle_ticks = 0
+                await self._remove_idle_slot()
+
+    def _on_session_rejected(self):
+        """Upstream refused a session restored from disk - re-authenticate
+        everything once instead of trusting the rest of them."""
+        for slot in self._slots:
+            slot.restored = False
+        if self.slot_authenticator is None:
+            return
+        if self._reauth_task and not self._reauth_task.done():
+            return
+
+        async def _reauth():
+            print(f"[{self.region}] Saved session rejected, re-authenticating")
+            region_metrics(self.region).incr("reauths")
+            try:
+                await self.slot_authenticator(self)
+                save_sessions(self)
+            except Exception as e:
+                print(f"[{self.region}] Re-authentication failed: {e}")
+
+        self._reauth_task = asyncio.create_task(_reauth())
 
     def _pack(self, data: dict) -> bytes:
         packed = packb(data, use_single_float=True)
@@ -150,28 +459,90 @@ class PJSKClient:
         except Exception:
             return data
 
-    async def get_master(self, file: str) -> Any:
-        if file in self.master_cache:
-            return self.master_cache[file]
+    async def _unpack_async(self, data: bytes) -> Any:
+        if len(data) < UNPACK_OFFLOAD_BYTES:
+            return self._unpack(data)
+        # AES runs without the GIL, so the decrypt goes to the executor. msgpack
+        # holds it for a whole unpackb, so decoding is sliced up on the loop
+        # instead - in a thread it would stall the loop just as long
+        try:
+            decrypted = await self.app.run_blocking(decrypt, data, self.keyset)
+            return await unpack_yielding(decrypted)
+        except Exception:
+            return data
 
-        master_path = self.data_path / "master" / f"{file}.json"
-        async with aiofiles.open(master_path, "r", encoding="utf8") as f:
-            data = json.loads(await f.read())
-        self.master_cache[file] = data
-        return data
+    @property
+    def master_cache(self) -> dict[str, Any]:
+        """Files loaded so far in the current snapshot."""
+        return self.master.tables
 
-    async def _request_on_slot(
-        self, slot: UserSlot, req: RequestData[T]
-    ) -> Optional[T]:
+    async def get_master(self, file: str) -> Any:
+        return await self.master.get(file)
+
+    async def reload_master(self, force: bool = False) -> bool:
+        """Build a snapshot of the masterdata currently on disk and swap it in.
+
+        Everything the current snapshot had loaded is loaded into the new one
+        first, so no request pays the reload. Requests already holding the old
+        snapshot finish on it. Returns whether a swap happened."""
+        async with self._master_reload_lock:
+            master_path = self.data_path / "master"
+            data_version = read_data_version(master_path)
+            hashes = await asyncio.to_thread(update_manifest, master_path)
+            written = await run_in_process(
+                write_binary_snapshots, master_path, data_version, hashes
+            )
+            if written:
+                print(f"[{self.region}] wrote {written} masterdata snapshots")
+
+            old = self.master
+            if not force and data_version == old.data_version:
+                # e.g. startup: the snapshot was built before the manifest was
+                # read, and the next update diffs against these hashes
+                old.hashes = hashes
+                return False
+
+            new = MasterSnapshot(
+                master_path, data_version, shared=old.shared, hashes=hashes
+            )
+            reused = new.adopt(old)
+            await new.preload([file for file in old.tables if file not in new.tables])
+            self.master = new
+            changed = "?" if new.changed is None else len(new.changed)
+            print(
+                f"[{self.region}] masterdata {old.data_version} -> {data_version} "
+                f"({changed} files changed, {reused} reused, "
+                f"{len(new.tables) - reused} preloaded)"
+            )
+        await notify_master_swap(self, old, new)
+        return True
+
+    @staticmethod
+    def _url(slot: UserSlot, req: RequestData) -> str:
         url = f"{req.base_url.rstrip('/')}/{req.path.lstrip('/')}".format_map(
             {"user_id": slot.user_id}
         )
         if req.trailing_slash:
-            url = url.rstrip("/") + "/"
-        else:
-            url = url.rstrip("/")
+            return url.rstrip("/") + "/"
+        return url.rstrip("/")
+
+    def _take_response_headers(self, slot: UserSlot, response: aiohttp.ClientResponse):
+        if "Set-Cookie" in response.headers:
+            self.update_shared_headers({"Cookie": response.headers["Set-Cookie"]})
+
+        session_token = response.headers.get("X-Session-Token")
+        if session_token:
+            slot.session._default_headers.update({"X-Session-Token": session_token})
+
+    async def _request_on_slot(
+        self, slot: UserSlot, req: RequestData[T]
+    ) -> Optional[T]:
+        url = self._url(slot, req)
         body = self._pack(req.data) if req.data is not None else None
 
+        metrics = region_metrics(self.region)
+        metrics.incr("upstream_requests")
+        start = time.perf_counter()
         async with slot.session.request(
             method=req.method.upper(),
             url=url,
@@ -180,10 +551,17 @@ class PJSKClient:
             headers=req.headers,
         ) as response:
             raw = await response.read()
+            metrics.observe(
+                "upstream_ms", req.path, (time.perf_counter() - start) * 1000
+            )
+            metrics.observe("payload_bytes", req.path, len(raw))
 
             if response.status >= 400:
+                metrics.incr(f"upstream_status_{response.status}")
                 if response.status == 426:
                     self.got_426 = True
+                if response.status in (401, 403) and slot.restored:
+                    self._on_session_rejected()
                 err = aiohttp.ClientResponseError(
                     response.request_info,
                     response.history,
@@ -193,27 +571,82 @@ class PJSKClient:
                 err.slot = slot
                 raise err
 
-            if "Set-Cookie" in response.headers:
-                self.update_shared_headers({"Cookie": response.headers["Set-Cookie"]})
+            self._take_response_headers(slot, response)
+            # upstream took the session - later 401/403s on this slot are
+            # ordinary errors, not a sign the saved sessions went stale
+            slot.restored = False
 
-            session_token = response.headers.get("X-Session-Token")
-            if session_token:
-                slot.session._default_headers.update({"X-Session-Token": session_token})
-
-            result = self._unpack(raw)
+            start = time.perf_counter()
+            result = await self._unpack_async(raw)
+            metrics.observe("unpack_ms", req.path, (time.perf_counter() - start) * 1000)
 
             # row responses leave userCard/honors schema-encoded - restore them per the bundle's
             # route decorators before anyone (or a response model) reads the response
             if isinstance(result, dict) and self.region in REGION_ROW:
+                start = time.perf_counter()
                 result = await nuverse_api_restorer(result, req.path, self.region)
+                metrics.observe(
+                    "restore_ms", req.path, (time.perf_counter() - start) * 1000
+                )
 
             if req.response_model is not None and isinstance(result, dict):
+                if req.lazy:
+                    return LazyModel(req.response_model, result)
                 return req.response_model.model_validate(result)
 
             return result
 
+    @staticmethod
+    def request_key(req: RequestData) -> tuple | None:
+        """Canonical form of a request for coalescing (None if it can't be keyed)."""
+
+        def canonical(value) -> tuple:
+            # type-tagged so {1: x} and {"1": x}, or 1 and 1.0, stay different
+            # requests - they're packed differently
+            if isinstance(value, dict):
+                return (
+                    "map",
+                    tuple(
+                        sorted((canonical(k), canonical(v)) for k, v in value.items())
+                    ),
+                )
+            if isinstance(value, (list, tuple)):  # both packed as arrays
+                return ("array", tuple(canonical(v) for v in value))
+            if value is None or isinstance(value, (bool, int, float, str, bytes)):
+                return (type(value).__name__, value)
+            raise TypeError(f"can't key {type(value).__name__}")
+
+        try:
+            return (
+                req.method.upper(),
+                req.base_url.rstrip("/"),
+                req.path,
+                req.trailing_slash,
+                canonical(req.params),
+                canonical(req.data),
+                canonical(req.headers),
+                req.response_model,
+                req.lazy,
+            )
+        except TypeError:  # unknown types in the body - just don't share
+            return None
+
     async def request(self, req: RequestData[T]) -> Optional[T]:
-        slot = await self._acquire_slot()
+        attempts = _attempts.get()
+        if attempts is not None:
+            attempts[req.path] = attempts.get(req.path, 0) + 1
+            if attempts[req.path] > 1:
+                region_metrics(self.region).incr("retries")
+
+        priority = req.priority
+        if _background_work.get():
+            priority = max(priority, RequestPriority.BACKGROUND)
+        await self.governor.acquire(req.path, RATE_MAX_WAIT[priority])
+        start = time.perf_counter()
+        slot = await self._acquire_slot(priority)
+        region_metrics(self.region).observe(
+            "slot_wait_ms", req.path, (time.perf_counter() - start) * 1000
+        )
         try:
             return await self._request_on_slot(slot, req)
         finally:
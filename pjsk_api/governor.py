@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import asyncio
+import re
+import time
+
+# path class -> pattern on the request path, first match wins
+PATH_CLASSES: list[tuple[str, re.Pattern]] = [
+    ("ranking", re.compile(r"ranking|border", re.IGNORECASE)),
+    ("custom_score", re.compile(r"custom[-_]?music[-_]?score", re.IGNORECASE)),
+    ("profile", re.compile(r"profile", re.IGNORECASE)),
+]
+DEFAULT_CLASS = "default"
+ANY_REGION = "*"
+
+
+class RateLimited(Exception):
+    """The request would have had to wait longer than it's allowed to."""
+
+    def __init__(self, region: str, path_class: str, wait: float):
+        super().__init__(
+            f"[{region}] {path_class} over budget (would wait {wait:.1f}s)"
+        )
+        self.region = region
+        self.path_class = path_class
+        self.wait = wait
+
+
+def classify(path: str) -> str:
+    for name, pattern in PATH_CLASSES:
+        if pattern.search(path):
+            return name
+    return DEFAULT_CLASS
+
+
+class TokenBucket:
+    """`rate` requests/s with up to `burst` at once. Callers reserve a token
+    up front (the balance can go negative) and sleep off the debt, which keeps
+    waiters in arrival order without a queue."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.waiting = 0
+        self.rejected = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, max_wait: float) -> float | None:
+        """Take a token; returns how long to wait for it, or None (nothing
+        taken) if that would be longer than max_wait."""
+        self._refill()
+        wait = max(0.0, (1 - self.tokens) / self.rate)
+        if wait > max_wait:
+            self.rejected += 1
+            return None
+        self.tokens -= 1
+        return wait
+
+    def snapshot(self) -> dict:
+        self._refill()
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "available": round(self.tokens, 2),
+            "used": round(1 - self.tokens / self.burst, 3),
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+        }
+
+
+class RateGovernor:
+    def __init__(self, region: str, limits: dict[str, tuple[float, int]]):
+        self.region = region
+        self.buckets = {
+            name: TokenBucket(rate, burst) for name, (rate, burst) in limits.items()
+        }
+
+    async def acquire(self, path: str, max_wait: float) -> None:
+        path_class = classify(path)
+        bucket = self.buckets.get(path_class) or self.buckets.get(DEFAULT_CLASS)
+        if bucket is None:
+            return  # unlimited
+
+        wait = bucket.reserve(max_wait)
+        if wait is None:
+            raise RateLimited(
+                self.region, path_class, (1 - bucket.tokens) / bucket.rate
+            )
+        if wait:
+            bucket.waiting += 1
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                bucket.waiting -= 1
+
+    def snapshot(self) -> dict:
+        return {name: bucket.snapshot() for name, bucket in self.buckets.items()}
+
+
+_governors: dict[str, RateGovernor] = {}
+
+
+def region_governor(region: str, config: dict[str, dict]) -> RateGovernor:
+    """The region's governor (shared by every client of that region in this
+    worker). `config` is region -> path class -> limit, "*" applying to all
+    regions with per-region entries overriding it."""
+    governor = _governors.get(region)
+    if governor is None:
+        limits = {**config.get(ANY_REGION, {}), **config.get(region, {})}
+        governor = _governors[region] = RateGovernor(
+            region,
+            {name: (limit.rate, limit.burst) for name, limit in limits.items()},
+        )
+    return governor
+
+
+def governors_snapshot() -> dict[str, dict]:
+    return {region: governor.snapshot() for region, governor in _governors.items()}
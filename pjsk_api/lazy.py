@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+from typing import Any, Generic, Type, TypeVar
+
+from pydantic import BaseModel, TypeAdapter
+
+M = TypeVar("M", bound=BaseModel)
+
+# (model, field name) -> (key in the raw data, adapter for the field's type)
+_field_adapters: dict[tuple[type, str], tuple[str, TypeAdapter]] = {}
+
+
+def _field_adapter(model: Type[BaseModel], name: str) -> tuple[str, TypeAdapter]:
+    cached = _field_adapters.get((model, name))
+    if cached is None:
+        field = model.model_fields[name]
+        cached = _field_adapters[(model, name)] = (
+            field.alias or name,
+            TypeAdapter(field.annotation),
+        )
+    return cached
+
+
+class LazyModel(Generic[M]):
+    """A response model that validates each field on first access instead of
+    the whole response up front - for big responses where callers read a few
+    fields (or just pass the raw dict on).
+
+    Field errors surface on access. `raw` is the unvalidated response,
+    `model` (or model_dump()) validates everything."""
+
+    __slots__ = ("_model_cls", "_raw", "_fields", "_model")
+
+    def __init__(self, model: Type[M], raw: dict):
+        self._model_cls = model
+        self._raw = raw
+        self._fields: dict[str, Any] = {}
+        self._model: M | None = None
+
+    @property
+    def raw(self) -> dict:
+        return self._raw
+
+    @property
+    def model(self) -> M:
+        if self._model is None:
+            self._model = self._model_cls.model_validate(self._raw)
+        return self._model
+
+    def __getattr__(self, name: str) -> Any:
+        # only called for names that aren't slots/properties
+        if name in self._fields:
+            return self._fields[name]
+        if self._model is not None or name not in self._model_cls.model_fields:
+            return getattr(self.model, name)
+
+        key, adapter = _field_adapter(self._model_cls, name)
+        if key not in self._raw:
+            # let the model apply the default (or raise for a required field)
+            return getattr(self.model, name)
+        value = self._fields[name] = adapter.validate_python(self._raw[key])
+        return value
+
+    def model_dump(self, **kwargs) -> dict:
+        return self.model.model_dump(**kwargs)
+
+    def __repr__(self) -> str:
+        return f"LazyModel({self._model_cls.__name__})"
@@ -0,0 +1,418 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import time
+from msgpack import packb, unpackb
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Iterable, TYPE_CHECKING
+
+from .unpack import unpack_yielding
+
+if TYPE_CHECKING:
+    from .client import PJSKClient
+
+# columns indexed as soon as a file is loaded (primary key + the foreign keys
+# routes join on). any other column gets its index built on first lookup,
+# which is still once per load since tables are never mutated after that.
+MASTER_INDEXES: dict[str, tuple[str, ...]] = {
+    "musics": ("id",),
+    "musicVocals": ("id", "musicId"),
+    "musicDifficulties": ("musicId",),
+    "musicTags": ("musicId",),
+    "musicOriginals": ("musicId",),
+    "musicCollaborations": ("id",),
+    "musicAssetVariants": ("musicVocalId",),
+    "musicArtists": ("id",),
+    "gameCharacters": ("id",),
+    "outsideCharacters": ("id",),
+    "events": ("id",),
+    "rankMatchSeasons": ("id",),
+    "customMusicScoreOfficialCreators": ("scoreId",),
+    "customMusicScoreOfficialCreatorProfiles": ("id",),
+}
+
+# msgpack copies of the json files, written on sync and preferred when loading
+SNAPSHOT_DIR = ".snapshots"
+# dataVersions whose snapshot directories are kept (current one included)
+KEEP_SNAPSHOT_VERSIONS = 3
+# file -> sha256 of its json (+ the size/mtime it was hashed at)
+MANIFEST_FILE = ".manifest.json"
+
+
+class MasterTable(list):
+    """A masterdata file (list of rows) with O(1) lookups by column.
+
+    Still a plain list to everything that iterates/serializes it; treat it as
+    read-only, indexes are not updated if the rows change."""
+
+    __slots__ = ("name", "_indexes")
+
+    def __init__(self, name: str, rows: list[dict]):
+        super().__init__(rows)
+        self.name = name
+        self._indexes: dict[str, dict[Any, tuple[dict, ...]]] = {}
+        for key in MASTER_INDEXES.get(name, ()):
+            self.grouped(key)
+
+    def grouped(self, key: str) -> dict[Any, tuple[dict, ...]]:
+        """Rows grouped by `key` (rows without the column are left out)."""
+        index = self._indexes.get(key)
+        if index is not None:
+            return index
+
+        grouped: dict[Any, list[dict]] = {}
+        for row in self:
+            if not isinstance(row, dict) or key not in row:
+                continue
+            try:
+                grouped.setdefault(row[key], []).append(row)
+            except TypeError:  # unhashable column value, can't be looked up anyway
+                continue
+        index = self._indexes[key] = {k: tuple(v) for k, v in grouped.items()}
+        return index
+
+    def find(self, value: Any, key: str = "id") -> dict | None:
+        """First row where `key == value`, or None."""
+        rows = self.grouped(key).get(value)
+        return rows[0] if rows else None
+
+    def group(self, value: Any, key: str) -> tuple[dict, ...]:
+        """All rows where `key == value` (file order)."""
+        return self.grouped(key).get(value, ())
+
+
+_process_pool: ProcessPoolExecutor | None = None
+
+
+async def run_in_process(func: Callable[..., Any], *args) -> Any:
+    """Run a blocking module-level function in the masterdata worker process.
+
+    json/msgpack encoding and decoding hold the GIL, so in a thread they stall
+    the event loop just as long; bulk conversions (snapshots, segments) go
+    here instead. One process, so they queue rather than compete."""
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("spawn")
+        )
+    return await asyncio.get_running_loop().run_in_executor(_process_pool, func, *args)
+
+
+def shutdown_process_pool():
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+
+def _version_dir(master_path: Path, data_version: str | None) -> Path:
+    return master_path / SNAPSHOT_DIR / (data_version or "unversioned")
+
+
+def _snapshot_path(master_path: Path, data_version: str | None, file: str) -> Path:
+    return _version_dir(master_path, data_version) / f"{file}.msgpack"
+
+
+def _read_hash(snapshot_path: Path) -> str | None:
+    try:
+        return snapshot_path.with_suffix(".sha256").read_text()
+    except OSError:
+        return None
+
+
+def _link_or_copy(src: Path, dest: Path):
+    tmp = dest.with_suffix(f".{os.getpid()}.tmp")  # workers race here
+    try:
+        os.link(src, tmp)
+    except OSError:  # no hard links on this filesystem
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dest)
+
+
+def write_binary_snapshots(
+    master_path: Path, data_version: str | None, hashes: dict[str, str] | None = None
+) -> int:
+    """Write msgpack copies of every masterdata json into this dataVersion's
+    own snapshot directory, which is never rewritten afterwards - so a
+    MasterSnapshot that loads a file late still gets its own version.
+
+    With the manifest `hashes`, files whose content an older version already
+    has are linked from there instead of encoded again. Only the newest
+    KEEP_SNAPSHOT_VERSIONS versions are kept. Blocking - run it with
+    run_in_process().
+    Returns how many were written."""
+    version_dir = _version_dir(master_path, data_version)
+    version_dir.mkdir(parents=True, exist_ok=True)
+    others = [
+        d
+        for d in (master_path / SNAPSHOT_DIR).iterdir()
+        if d.is_dir() and d != version_dir
+    ]
+    others.sort(key=lambda d: d.stat().st_mtime, reverse=True)
+
+    written = 0
+    for json_path in master_path.glob("*.json"):
+        if json_path.name.startswith("."):
+            continue
+        file = json_path.stem
+        snapshot_path = version_dir / f"{file}.msgpack"
+        source_hash = (hashes or {}).get(file)
+        if snapshot_path.exists() and (
+            source_hash is None or _read_hash(snapshot_path) == source_hash
+        ):
+            continue  # e.g. another worker got here first
+
+        reusable = source_hash and next(
+            (
+                d / f"{file}.msgpack"
+                for d in others
+                if _read_hash(d / f"{file}.msgpack") == source_hash
+                and (d / f"{file}.msgpack").exists()
+            ),
+            None,
+        )
+        if reusable:
+            _link_or_copy(reusable, snapshot_path)
+        else:
+            with open(json_path, "r", encoding="utf8") as f:
+                data = json.load(f)
+            tmp = snapshot_path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp, "wb") as f:
+                f.write(packb(data, use_bin_type=True))
+            os.replace(tmp, snapshot_path)
+            written += 1
+        hash_path = snapshot_path.with_suffix(".sha256")
+        if source_hash:
+            hash_path.write_text(source_hash)
+        else:
+            hash_path.unlink(missing_ok=True)
+
+    # older versions; workers still on one of the kept ones can finish on it
+    for old in others[KEEP_SNAPSHOT_VERSIONS - 1 :]:
+        shutil.rmtree(old, ignore_errors=True)
+    # snapshots from before they were versioned
+    for legacy in (master_path / SNAPSHOT_DIR).glob("*.*"):
+        if legacy.is_file():
+            legacy.unlink(missing_ok=True)
+    return written
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def update_manifest(master_path: Path) -> dict[str, str]:
+    """file -> sha256 of every masterdata json, saved to MANIFEST_FILE.
+
+    Only files whose size or mtime changed since the saved manifest are
+    hashed again. Blocking - run it in a thread."""
+    manifest_path = master_path / MANIFEST_FILE
+    try:
+        with open(manifest_path, "r", encoding="utf8") as f:
+            saved: dict[str, dict] = json.load(f)
+    except (OSError, ValueError):
+        saved = {}
+
+    entries = {}
+    for json_path in master_path.glob("*.json"):
+        if json_path.name.startswith("."):
+            continue
+        stat = json_path.stat()
+        entry = saved.get(json_path.stem)
+        if not (
+            entry
+            and entry.get("size") == stat.st_size
+            and entry.get("mtime_ns") == stat.st_mtime_ns
+        ):
+            entry = {
+                "sha256": _sha256(json_path),
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+            }
+        entries[json_path.stem] = entry
+
+    if entries != saved:
+        tmp = manifest_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf8") as f:
+            json.dump(entries, f)
+        os.replace(tmp, manifest_path)
+    return {file: entry["sha256"] for file, entry in entries.items()}
+
+
+def read_master_file(
+    master_path: Path, file: str, data_version: str | None = None
+) -> Any:
+    """Decoded contents of a masterdata file as of `data_version`, from its
+    msgpack snapshot (several times faster than json). Falls back to the json,
+    i.e. whatever version is on disk now, if that version has no snapshot yet.
+    Blocking."""
+    snapshot_path = _snapshot_path(master_path, data_version, file)
+    try:
+        with open(snapshot_path, "rb") as f:
+            return unpackb(f.read(), raw=False, strict_map_key=False)
+    except FileNotFoundError:
+        pass
+    with open(master_path / f"{file}.json", "r", encoding="utf8") as f:
+        return json.load(f)
+
+
+def _read_table(master_path: Path, file: str, data_version: str | None) -> Any:
+    data = read_master_file(master_path, file, data_version)
+    if isinstance(data, list):
+        data = MasterTable(file, data)
+    return data
+
+
+def read_data_version(master_path: Path) -> str | None:
+    version_path = master_path / ".dataversion.json"
+    try:
+        with open(version_path, "r", encoding="utf8") as f:
+            return json.load(f).get("dataVersion")
+    except (OSError, ValueError):
+        return None
+
+
+class MasterSnapshot:
+    """All masterdata for one dataVersion.
+
+    Files load on first use and stay cached for the life of the snapshot. A
+    data update never touches an existing snapshot - a new one is built and
+    swapped in. Files are read from this version's own snapshot directory
+    (see write_binary_snapshots), so one loaded late, after an update has
+    already rewritten the json, still has this snapshot's version.
+
+    The exception is a version without a snapshot directory yet (a fresh
+    install, before the first reload_master): its files come from the json,
+    and an update running at that moment can hand it newer content.
+
+    `changed` is the set of files that differ from the snapshot this one
+    replaced (None when unknown - treat everything as changed)."""
+
+    def __init__(
+        self,
+        master_path: Path,
+        data_version: str | None,
+        shared: bool = False,
+        hashes: dict[str, str] | None = None,
+    ):
+        self.master_path = master_path
+        self.data_version = data_version
+        self.shared = shared  # serve list files from cross-worker mmap segments
+        self.hashes = hashes  # file -> sha256, from the manifest
+        self.changed: frozenset[str] | None = None
+        self.tables: dict[str, Any] = {}
+        self.load_times: dict[str, float] = {}  # file -> first-touch load (ms)
+        self._pending: dict[str, asyncio.Task] = {}
+
+    async def _load(self, file: str) -> Any:
+        start = time.perf_counter()
+        try:
+            if self.shared:
+                from .shared_master import (
+                    SharedMasterTable,
+                    ensure_segment,
+                    segment_path,
+                )
+
+                json_path = self.master_path / f"{file}.json"
+                seg_path = segment_path(self.master_path, self.data_version, file)
+                if await run_in_process(
+                    ensure_segment, json_path, seg_path, file, self.data_version
+                ):
+                    return SharedMasterTable(file, seg_path)
+
+            snapshot_path = _snapshot_path(self.master_path, self.data_version, file)
+            try:
+                raw = await asyncio.to_thread(snapshot_path.read_bytes)
+            except FileNotFoundError:
+                # no snapshot for this version yet. json can only be decoded in
+                # one go, holding the GIL (and so the loop) for all of it
+                return await asyncio.to_thread(
+                    _read_table, self.master_path, file, self.data_version
+                )
+            # msgpack also holds the GIL, so decode row by row on the loop
+            data = await unpack_yielding(raw, depth=1)
+            return MasterTable(file, data) if isinstance(data, list) else data
+        finally:
+            self.load_times[file] = (time.perf_counter() - start) * 1000
+
+    async def get(self, file: str) -> Any:
+        if file in self.tables:
+            return self.tables[file]
+
+        # concurrent first touches share one load
+        task = self._pending.get(file)
+        if task is None:
+            task = self._pending[file] = asyncio.ensure_future(self._load(file))
+        try:
+            data = await asyncio.shield(task)
+        finally:
+            if task.done():
+                self._pending.pop(file, None)
+        self.tables[file] = data
+        return data
+
+    def adopt(self, old: MasterSnapshot) -> int:
+        """Work out `changed` against `old` and take over the tables it loaded
+        for files whose content is identical. Returns how many were reused."""
+        if self.hashes is None or old.hashes is None:
+            return 0
+        self.changed = frozenset(
+            file
+            for file in self.hashes.keys() | old.hashes.keys()
+            if self.hashes.get(file) != old.hashes.get(file)
+        )
+        reused = 0
+        for file, table in old.tables.items():
+            if file not in self.changed and file in self.hashes:
+                self.tables[file] = table
+                reused += 1
+        return reused
+
+    def touches(self, files: Iterable[str]) -> bool:
+        """Whether any of `files` changed in this snapshot."""
+        return self.changed is None or not self.changed.isdisjoint(files)
+
+    async def preload(self, files: Iterable[str]) -> None:
+        for file in files:
+            try:
+                await self.get(file)
+            except OSError:
+                pass  # file dropped in this version, callers get the error on use
+
+
+# (client, old, new) - called after a client swaps in a new snapshot; new.changed
+# / new.touches() say which files differ
+MasterSwapCallback = Callable[
+    ["PJSKClient", MasterSnapshot, MasterSnapshot], Awaitable[None]
+]
+_swap_callbacks: list[MasterSwapCallback] = []
+
+
+def on_master_swap(callback: MasterSwapCallback) -> MasterSwapCallback:
+    """Register a coroutine to run whenever any region swaps its masterdata
+    snapshot (derived caches rebuild/invalidate here). Usable as a decorator."""
+    _swap_callbacks.append(callback)
+    return callback
+
+
+async def notify_master_swap(
+    client: PJSKClient, old: MasterSnapshot, new: MasterSnapshot
+) -> None:
+    for callback in list(_swap_callbacks):
+        try:
+            await callback(client, old, new)
+        except Exception as e:
+            print(
+                f"[{client.region}] master swap callback {callback.__name__} failed: {e}"
+            )
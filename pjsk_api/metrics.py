@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import bisect
+import re
+
+# bucket upper bounds; anything above the last one lands in "+inf"
+MS_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+BYTES_BUCKETS = (1 << 10, 1 << 14, 1 << 17, 1 << 20, 1 << 22, 1 << 24, 1 << 26)
+
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+def path_template(path: str) -> str:
+    """/user/123/event/45/ranking -> /user/{n}/event/{n}/ranking, so ids
+    don't explode the number of series."""
+    return _ID_SEGMENT.sub("/{n}", path.split("?", 1)[0])
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "count", "total", "max")
+
+    def __init__(self, bounds: tuple[int, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float | None:
+        """Upper bound of the bucket holding the q-th value (None if empty)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.bounds, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return self.max
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "avg": self.total / self.count if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "max": self.max,
+            "buckets": {
+                **{str(b): n for b, n in zip(self.bounds, self.counts)},
+                "+inf": self.counts[-1],
+            },
+        }
+
+
+class RegionMetrics:
+    """Histograms per (metric, path template) and plain counters for a region.
+
+    Kept per worker process and outside PJSKClient, so they survive the client
+    being recreated."""
+
+    # metric -> bucket bounds
+    HISTOGRAMS = {
+        "slot_wait_ms": MS_BUCKETS,
+        "upstream_ms": MS_BUCKETS,
+        "payload_bytes": BYTES_BUCKETS,
+        "unpack_ms": MS_BUCKETS,
+        "restore_ms": MS_BUCKETS,
+    }
+
+    def __init__(self):
+        self.histograms: dict[str, dict[str, Histogram]] = {
+            name: {} for name in self.HISTOGRAMS
+        }
+        self.counters: dict[str, int] = {}
+
+    def observe(self, name: str, path: str, value: float):
+        by_path = self.histograms[name]
+        template = path_template(path)
+        histogram = by_path.get(template)
+        if histogram is None:
+            histogram = by_path[template] = Histogram(self.HISTOGRAMS[name])
+        histogram.observe(value)
+
+    def incr(self, name: str, n: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def snapshot(self) -> dict:
+        return {
+            "histograms": {
+                name: {path: h.snapshot() for path, h in by_path.items()}
+                for name, by_path in self.histograms.items()
+            },
+            "counters": dict(self.counters),
+        }
+
+
+_regions: dict[str, RegionMetrics] = {}
+
+
+def region_metrics(region: str) -> RegionMetrics:
+    metrics = _regions.get(region)
+    if metrics is None:
+        metrics = _regions[region] = RegionMetrics()
+    return metrics
+
+
+def metrics_snapshot() -> dict[str, dict]:
+    return {region: metrics.snapshot() for region, metrics in _regions.items()}
@@ -0,0 +1,144 @@
+"""Persist authenticated slot sessions so a restart doesn't log every slot in again.
+
+Each worker process claims its own session file (`.sessions/<n>.json`, held
+with an exclusive lock for the life of the client) since game session tokens
+rotate per response and can't be shared between processes. Restored sessions
+are trusted until upstream rejects one, then the client falls back to a full
+authentication (see PJSKClient._on_session_rejected)."""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from typing import TYPE_CHECKING
+
+from .models import SekaiUserAuthData
+
+try:
+    import fcntl
+except ImportError:  # windows - single session file, don't run several workers
+    fcntl = None
+
+if TYPE_CHECKING:
+    from .client import PJSKClient
+
+SESSIONS_DIR = ".sessions"
+SESSION_MAX_AGE = 3600  # seconds; older sessions are assumed expired
+MAX_SESSION_FILES = 64
+
+
+def _claim_session_file(client: PJSKClient):
+    if client._session_file is not None:
+        return client._session_file
+
+    directory = client.data_path / SESSIONS_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+    for n in range(MAX_SESSION_FILES if fcntl else 1):
+        lock = open(directory / f"{n}.lock", "a+b")
+        if fcntl:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock.close()
+                continue
+        client._session_lock = lock
+        client._session_file = directory / f"{n}.json"
+        return client._session_file
+    return None
+
+
+def release_session_file(client: PJSKClient):
+    if client._session_lock is not None:
+        client._session_lock.close()  # closing drops the flock
+        client._session_lock = None
+        client._session_file = None
+
+
+def save_sessions(client: PJSKClient) -> None:
+    path = _claim_session_file(client)
+    if path is None or not client.is_authenticated:
+        return
+
+    base_headers = {**client.default_headers, **client._shared_headers}
+    slots = []
+    for slot in client._slots:
+        if slot.session is None or slot.user_id is None:
+            continue
+        slots.append(
+            {
+                "user_id": slot.user_id,
+                "credential": slot.credential,
+                "user": slot.user.model_dump() if slot.user else None,
+                # whatever authentication put on the session (X-Session-Token...)
+                "headers": {
+                    k: v
+                    for k, v in slot.session._default_headers.items()
+                    if base_headers.get(k) != v
+                },
+            }
+        )
+
+    data = {
+        "app_version": client.app_version,
+        "saved_at": time.time(),
+        "shared_headers": client._shared_headers,
+        "slots": slots,
+        # logins of slots the pool shrank away, reused when it grows again
+        "spare_logins": [
+            {"user_id": user_id, "credential": credential}
+            for user_id, credential in client._spare_logins
+        ],
+    }
+    tmp = path.with_suffix(".tmp")
+    with open(
+        os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w", encoding="utf8"
+    ) as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def restore_sessions(client: PJSKClient) -> bool:
+    """Load saved sessions into the client's slots (after start()). True only if
+    every slot got one - otherwise nothing is applied and a full auth is needed."""
+    path = _claim_session_file(client)
+    if path is None:
+        return False
+    try:
+        with open(path, "r", encoding="utf8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return False
+
+    # logins outlive sessions, so keep these even if the sessions are stale
+    client._spare_logins = [
+        (entry["user_id"], entry.get("credential"))
+        for entry in data.get("spare_logins", [])
+    ]
+
+    if data.get("app_version") != client.app_version:
+        return False
+    if data.get("saved_at", 0) + SESSION_MAX_AGE < time.time():
+        return False
+    saved = data.get("slots", [])
+    if len(saved) < len(client._slots):
+        return False
+
+    try:
+        users = [
+            SekaiUserAuthData.model_validate(s["user"]) if s.get("user") else None
+            for s in saved
+        ]
+    except ValueError:
+        return False
+
+    client.update_shared_headers(data.get("shared_headers", {}))
+    for slot, entry, user in zip(client._slots, saved, users):
+        slot.user_id = entry["user_id"]
+        slot.credential = entry.get("credential")
+        slot.user = user
+        slot.session._default_headers.update(entry.get("headers", {}))
+        slot.restored = True
+    client.is_authenticated = True
+    print(f"[{client.region}] Restored {len(client._slots)} saved sessions")
+    return True
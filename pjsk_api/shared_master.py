@@ -0,0 +1,205 @@
+"""Masterdata tables shared between worker processes through mmap'd segments.
+
+Each masterdata file is serialized once (by whichever worker gets there first)
+into a read-only segment under `master/.shared/<dataVersion>/`. Every worker
+maps the same file, so the OS shares the pages, and rows are only decoded when
+they are read - nothing is kept per worker beyond the index row numbers.
+
+Segment layout (little endian):
+
+    magic "SBMT" | row count (u64) | index offset (u64) | index length (u64)
+    row offsets ((count + 1) x u64, relative to the start of the rows)
+    rows (one msgpack blob each)
+    index (msgpack {column: {value: [row, ...]}})
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import shutil
+import struct
+from collections.abc import Mapping, Sequence
+from pathlib import Path
+from typing import Any, Iterator
+
+from msgpack import packb, unpackb
+
+from .master import MASTER_INDEXES, read_data_version, read_master_file
+
+try:
+    import fcntl
+except (
+    ImportError
+):  # windows - segments are written atomically, worst case is duplicate work
+    fcntl = None
+
+MAGIC = b"SBMT"
+_HEADER = struct.Struct("<4sQQQ")
+SHARED_DIR = ".shared"
+
+
+def _unpack(blob) -> Any:
+    return unpackb(blob, raw=False, strict_map_key=False)
+
+
+def write_segment(name: str, rows: list, out_path: Path) -> None:
+    blobs = [packb(row, use_bin_type=True) for row in rows]
+
+    indexes: dict[str, dict[Any, list[int]]] = {}
+    for key in MASTER_INDEXES.get(name, ()):
+        grouped = indexes[key] = {}
+        for i, row in enumerate(rows):
+            if isinstance(row, dict) and key in row:
+                try:
+                    grouped.setdefault(row[key], []).append(i)
+                except TypeError:
+                    continue
+    index_blob = packb(indexes, use_bin_type=True)
+
+    offsets = [0]
+    for blob in blobs:
+        offsets.append(offsets[-1] + len(blob))
+    rows_start = _HEADER.size + 8 * len(offsets)
+
+    tmp = out_path.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        f.write(
+            _HEADER.pack(MAGIC, len(blobs), rows_start + offsets[-1], len(index_blob))
+        )
+        f.write(struct.pack(f"<{len(offsets)}Q", *offsets))
+        for blob in blobs:
+            f.write(blob)
+        f.write(index_blob)
+    os.replace(tmp, out_path)
+
+
+def segment_path(master_path: Path, data_version: str | None, file: str) -> Path:
+    return master_path / SHARED_DIR / (data_version or "unversioned") / f"{file}.bin"
+
+
+def ensure_segment(
+    json_path: Path, seg_path: Path, file: str, data_version: str | None = None
+) -> bool:
+    """Build the segment for `json_path` (as of `data_version`) unless an up to
+    date one exists.
+
+    Blocking - run it with run_in_process(). Returns False if the file isn't a list
+    (those stay regular per-worker data)."""
+
+    def _fresh() -> bool:
+        try:
+            return seg_path.stat().st_mtime >= json_path.stat().st_mtime
+        except FileNotFoundError:
+            return False
+
+    if _fresh():
+        return True
+
+    shared_root = seg_path.parent.parent
+    seg_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(shared_root / ".lock", "a+b") as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            if _fresh():  # another worker built it while we waited
+                return True
+
+            # OSError propagates like a normal load
+            rows = read_master_file(json_path.parent, file, data_version)
+            if not isinstance(rows, list):
+                return False
+            write_segment(file, rows, seg_path)
+
+            # drop segments of older versions once the current one is being
+            # built. workers still mapping them keep their pages until they
+            # swap (unlink doesn't unmap).
+            if seg_path.parent.name == read_data_version(shared_root.parent):
+                for other in shared_root.iterdir():
+                    if other.is_dir() and other != seg_path.parent:
+                        shutil.rmtree(other, ignore_errors=True)
+            return True
+        finally:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+class _RowIndex(Mapping):
+    """value -> rows, decoding the rows on lookup."""
+
+    def __init__(self, table: SharedMasterTable, positions: dict[Any, list[int]]):
+        self._table = table
+        self._positions = positions
+
+    def __getitem__(self, value: Any) -> tuple[dict, ...]:
+        return tuple(self._table[i] for i in self._positions[value])
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._positions)
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+
+class SharedMasterTable(Sequence):
+    """MasterTable look-alike backed by a mmap'd segment.
+
+    Rows are decoded on every access, so don't hold on to them expecting
+    identity, and loop over a table once rather than per lookup."""
+
+    def __init__(self, name: str, path: Path):
+        self.name = name
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count, index_offset, index_length = _HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a masterdata segment")
+        self._count = count
+        self._offsets = memoryview(self._map)[
+            _HEADER.size : _HEADER.size + 8 * (count + 1)
+        ].cast("Q")
+        self._rows_start = _HEADER.size + 8 * (count + 1)
+        self._index_span = (index_offset, index_offset + index_length)
+        self._indexes: dict[str, dict[Any, list[int]]] | None = None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._count))]
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError(i)
+        start = self._rows_start + self._offsets[i]
+        end = self._rows_start + self._offsets[i + 1]
+        return _unpack(self._map[start:end])
+
+    def __iter__(self) -> Iterator[dict]:
+        for i in range(self._count):
+            yield self[i]
+
+    def _positions(self, key: str) -> dict[Any, list[int]]:
+        if self._indexes is None:
+            self._indexes = _unpack(self._map[slice(*self._index_span)])
+        positions = self._indexes.get(key)
+        if positions is None:
+            positions = self._indexes[key] = {}
+            for i, row in enumerate(self):
+                if isinstance(row, dict) and key in row:
+                    try:
+                        positions.setdefault(row[key], []).append(i)
+                    except TypeError:
+                        continue
+        return positions
+
+    def grouped(self, key: str) -> Mapping[Any, tuple[dict, ...]]:
+        return _RowIndex(self, self._positions(key))
+
+    def find(self, value: Any, key: str = "id") -> dict | None:
+        positions = self._positions(key).get(value)
+        return self[positions[0]] if positions else None
+
+    def group(self, value: Any, key: str) -> tuple[dict, ...]:
+        return tuple(self[i] for i in self._positions(key).get(value, ()))
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import asyncio
+import gc
+import time
+from typing import Any
+
+from msgpack import Unpacker
+
+# how long decoding may hold the event loop before it yields (seconds)
+YIELD_EVERY = 0.005
+
+
+def _is_map(type_byte: int) -> bool:
+    return 0x80 <= type_byte <= 0x8F or type_byte in (0xDE, 0xDF)
+
+
+def _is_array(type_byte: int) -> bool:
+    return 0x90 <= type_byte <= 0x9F or type_byte in (0xDC, 0xDD)
+
+
+async def unpack_yielding(data: bytes, depth: int = 2) -> Any:
+    """unpackb(data, raw=False, strict_map_key=False), decoded element by
+    element down to `depth` levels of maps/arrays and yielding to the event
+    loop every YIELD_EVERY.
+
+    msgpack's C decoder holds the GIL for the whole unpackb, so running it in
+    a thread stalls the loop just as long; slicing it up is what keeps the
+    loop responsive. Anything nested deeper than `depth` is decoded in one go,
+    so pick it so those pieces are small (e.g. rows)."""
+    unpacker = Unpacker(
+        raw=False, strict_map_key=False, max_buffer_size=max(len(data), 1)
+    )
+    unpacker.feed(data)
+    deadline = time.perf_counter() + YIELD_EVERY
+
+    async def walk(level: int) -> Any:
+        nonlocal deadline
+        if time.perf_counter() >= deadline:
+            await asyncio.sleep(0)
+            deadline = time.perf_counter() + YIELD_EVERY
+
+        if level < depth:
+            type_byte = data[unpacker.tell()]
+            if _is_map(type_byte):
+                result = {}
+                for _ in range(unpacker.read_map_header()):
+                    key = unpacker.unpack()
+                    result[key] = await walk(level + 1)
+                return result
+            if _is_array(type_byte):
+                return [
+                    await walk(level + 1) for _ in range(unpacker.read_array_header())
+                ]
+        return unpacker.unpack()
+
+    # the cyclic GC would otherwise run several full collections while the
+    # millions of new objects come in - each one a stall as long as the decode
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return await walk(0)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
@@ -0,0 +1,164 @@
+"""Measure per-endpoint response serialization: FastAPI's default path
+(jsonable_encoder + stdlib JSONResponse) vs FastJSONResponse returned
+directly, on payloads shaped like current_event, the full music catalog and
+a raw master file.
+
+    python -m scripts.bench_json_response
+    python -m scripts.bench_json_response 50   # iterations
+"""
+
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from helpers.json_response import FastJSONResponse, orjson
+
+
+def _current_event() -> dict:
+    def ranking(rank: int) -> dict:
+        return {
+            "rank": rank,
+            "score": random.randint(1_000_000, 90_000_000),
+            "userId": random.randint(10**15, 10**16),
+            "name": f"player {rank} ★",
+            "userCard": {
+                "cardId": random.randint(1, 1200),
+                "level": 60,
+                "masterRank": 5,
+                "specialTrainingStatus": "done",
+                "defaultImage": "special_training",
+            },
+            "userProfile": {
+                "word": "よろしく",
+                "twitterId": "",
+                "profileImageType": "leader",
+            },
+            "userCheerfulCarnival": {},
+            "userProfileHonors": [
+                {
+                    "seq": seq,
+                    "profileHonorType": "normal",
+                    "honorId": seq * 7,
+                    "honorLevel": 1,
+                }
+                for seq in range(1, 4)
+            ],
+            "userDeck": {f"member{i}": random.randint(1, 1200) for i in range(1, 6)},
+        }
+
+    return {
+        "updated": time.time(),
+        "next_available_update": time.time() + 300,
+        "event_id": 150,
+        "event_status": "going",
+        "top_100": {
+            "isOk": True,
+            "rankings": [ranking(rank) for rank in range(1, 101)],
+        },
+        "border": {
+            "eventId": 150,
+            "borderRankings": [
+                ranking(rank) for rank in (200, 300, 400, 500, 1000, 2000)
+            ],
+            "userWorldBloomChapterRankingBorders": [],
+        },
+    }
+
+
+def _musics(count: int = 600) -> dict:
+    url = "https://sbuga.com/api/pjsk_data/{}/music/jacket/jacket_s_{:03d}.webp"
+    return {
+        "musics": [
+            {
+                "id": i,
+                "title": f"曲 {i}",
+                "jacket_url": url.format("jp", i),
+                "published_at": 1600000000000 + i,
+                "categories": ["mv", "original"],
+                "vocals": [
+                    {
+                        "id": i * 10 + v,
+                        "caption": "セカイver.",
+                        "characters": [{"id": c, "name": "Miku"} for c in range(1, 5)],
+                        "assets": [{"type": "jacket", "url": url.format("jp", i)}],
+                    }
+                    for v in range(2)
+                ],
+                "difficulties": {
+                    d: {
+                        "level": random.randint(5, 37),
+                        "notes": random.randint(100, 2000),
+                    }
+                    for d in ("easy", "normal", "hard", "expert", "master", "append")
+                },
+                "tags": ["all", "vocaloid"],
+                "title_variants": [f"kyoku {i}", f"song {i}"],
+            }
+            for i in range(1, count + 1)
+        ]
+    }
+
+
+def _master_file() -> list:
+    for region in ("jp", "en"):
+        path = Path("pjsk_api") / "data" / region / "master" / "cards.json"
+        if path.exists():
+            return json.loads(path.read_text(encoding="utf8"))
+    return [
+        {
+            "id": i,
+            "seq": i * 10,
+            "characterId": i % 26 + 1,
+            "cardRarityType": "rarity_4",
+            "prefix": f"card {i}",
+            "assetbundleName": f"res{i:03d}_no{i:03d}",
+            "releaseAt": 1600000000000 + i,
+            "cardParameters": [
+                {
+                    "id": p,
+                    "cardLevel": p,
+                    "cardParameterType": "param1",
+                    "power": p * 30,
+                }
+                for p in range(1, 61)
+            ],
+        }
+        for i in range(1, 1201)
+    ]
+
+
+def _time_ms(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) * 1000 / iterations
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    print(f"orjson: {'yes' if orjson is not None else 'no (stdlib fallback)'}")
+    print(f"{'payload':<16} {'bytes':>10} {'default ms':>11} {'fast ms':>9}")
+    for name, payload in (
+        ("current_event", _current_event()),
+        ("musics", _musics()),
+        ("master/cards", _master_file()),
+    ):
+        before = JSONResponse(jsonable_encoder(payload)).body
+        after = FastJSONResponse(payload).body
+        assert json.loads(before) == json.loads(after)
+        print(
+            f"{name:<16} {len(after):>10} "
+            f"{_time_ms(lambda: JSONResponse(jsonable_encoder(payload)), iterations):>11.2f} "
+            f"{_time_ms(lambda: FastJSONResponse(payload), iterations):>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
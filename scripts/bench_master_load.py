@@ -0,0 +1,87 @@
+"""Compare first-touch masterdata load times: json vs the msgpack snapshots.
+
+Run from the repo root after the server has synced masterdata at least once.
+The snapshots are written to a temporary copy, so the server's own snapshot
+versions are left alone:
+
+    python -m scripts.bench_master_load            # jp
+    python -m scripts.bench_master_load en 15      # region, files to show
+"""
+
+import json
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from msgpack import unpackb
+
+from pjsk_api.master import (
+    _snapshot_path,
+    read_data_version,
+    update_manifest,
+    write_binary_snapshots,
+)
+
+
+def _time_ms(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    region = sys.argv[1] if len(sys.argv) > 1 else "jp"
+    top = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    live_path = Path("pjsk_api") / "data" / region / "master"
+    if not live_path.exists():
+        raise SystemExit(f"No masterdata for {region} at {live_path}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        master_path = Path(tmp)
+        for path in live_path.iterdir():  # the json, dataVersion and manifest
+            if path.is_file():
+                shutil.copy2(path, master_path / path.name)
+        _bench(master_path, top)
+
+
+def _bench(master_path: Path, top: int):
+    data_version = read_data_version(master_path)
+    write_binary_snapshots(master_path, data_version, update_manifest(master_path))
+
+    rows = []
+    for json_path in master_path.glob("*.json"):
+        if json_path.name.startswith("."):
+            continue
+        raw_json = json_path.read_text("utf8")
+        raw_pack = _snapshot_path(
+            master_path, data_version, json_path.stem
+        ).read_bytes()
+        rows.append(
+            (
+                json_path.stem,
+                len(raw_json.encode()),
+                _time_ms(lambda: json.loads(raw_json)),
+                _time_ms(lambda: unpackb(raw_pack, raw=False, strict_map_key=False)),
+            )
+        )
+
+    rows.sort(key=lambda r: r[2], reverse=True)
+    total_json = sum(r[2] for r in rows)
+    total_pack = sum(r[3] for r in rows)
+    print(f"{'file':<40} {'size':>10} {'json ms':>9} {'msgpack ms':>11}")
+    for name, size, json_ms, pack_ms in rows[:top]:
+        print(f"{name:<40} {size:>10} {json_ms:>9.2f} {pack_ms:>11.2f}")
+    print(
+        f"{'all ' + str(len(rows)) + ' files':<40} {'':>10} {total_json:>9.2f} {total_pack:>11.2f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
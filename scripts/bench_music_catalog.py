@@ -0,0 +1,159 @@
+"""Time compiling the /pjsk_data/musics catalog with per-music table scans
+(how it used to join) vs the grouped join, at the current row counts and
+with every music table scaled up.
+
+Run from the repo root after the server has synced masterdata at least once:
+
+    python -m scripts.bench_music_catalog           # jp, 1x and 5x
+    python -m scripts.bench_music_catalog en 1 5 10
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from api.pjsk_data.musics.index import _build_music
+from pjsk_api.master import MasterTable, read_data_version, read_master_file
+
+TABLES = (
+    "musics",
+    "musicVocals",
+    "musicTags",
+    "musicDifficulties",
+    "musicAssetVariants",
+    "musicArtists",
+)
+
+
+def _scaled(tables: dict[str, list], factor: int) -> dict[str, MasterTable]:
+    """Every music (and the rows joined to it) repeated `factor` times under
+    new ids."""
+    music_step = max(m["id"] for m in tables["musics"]) + 1
+    vocal_step = max(v["id"] for v in tables["musicVocals"]) + 1
+    out = {name: [] for name in TABLES}
+    out["musicArtists"] = tables["musicArtists"]
+    for k in range(factor):
+        out["musics"] += [
+            {**m, "id": m["id"] + k * music_step} for m in tables["musics"]
+        ]
+        out["musicVocals"] += [
+            {
+                **v,
+                "id": v["id"] + k * vocal_step,
+                "musicId": v["musicId"] + k * music_step,
+            }
+            for v in tables["musicVocals"]
+        ]
+        for name in ("musicTags", "musicDifficulties"):
+            out[name] += [
+                {**r, "musicId": r["musicId"] + k * music_step} for r in tables[name]
+            ]
+        out["musicAssetVariants"] += [
+            {**a, "musicVocalId": a["musicVocalId"] + k * vocal_step}
+            for a in tables["musicAssetVariants"]
+        ]
+    return {name: MasterTable(name, rows) for name, rows in out.items()}
+
+
+def _build(music, vocals, tags, difficulties, asset_variants, artist):
+    return _build_music(
+        music=music,
+        vocals=vocals,
+        tags=tags,
+        original=None,
+        collaboration=None,
+        difficulties=difficulties,
+        asset_variants=asset_variants,
+        artist=artist,
+        title_variants=[],
+        game_characters={},
+        outside_characters={},
+        asset_base_url="https://example.invalid",
+        region="jp",
+        image_type="webp",
+    )
+
+
+def _scan_join(t: dict[str, MasterTable]) -> list:
+    result = []
+    for music in t["musics"]:
+        music_id = music["id"]
+        vocals = [v for v in t["musicVocals"] if v["musicId"] == music_id]
+        result.append(
+            _build(
+                music,
+                vocals,
+                [r for r in t["musicTags"] if r["musicId"] == music_id],
+                [r for r in t["musicDifficulties"] if r["musicId"] == music_id],
+                {
+                    v["id"]: [
+                        a
+                        for a in t["musicAssetVariants"]
+                        if a["musicVocalId"] == v["id"]
+                    ]
+                    for v in vocals
+                },
+                next(
+                    (
+                        a
+                        for a in t["musicArtists"]
+                        if a["id"] == music.get("creatorArtistId")
+                    ),
+                    None,
+                ),
+            )
+        )
+    return result
+
+
+def _grouped_join(t: dict[str, MasterTable]) -> list:
+    vocals = t["musicVocals"].grouped("musicId")
+    tags = t["musicTags"].grouped("musicId")
+    difficulties = t["musicDifficulties"].grouped("musicId")
+    variants = t["musicAssetVariants"].grouped("musicVocalId")
+    return [
+        _build(
+            music,
+            vocals.get(music["id"], ()),
+            tags.get(music["id"], ()),
+            difficulties.get(music["id"], ()),
+            variants,
+            t["musicArtists"].find(music.get("creatorArtistId")),
+        )
+        for music in t["musics"]
+    ]
+
+
+def _time_ms(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    region = sys.argv[1] if len(sys.argv) > 1 else "jp"
+    factors = [int(a) for a in sys.argv[2:]] or [1, 5]
+    master_path = Path("pjsk_api") / "data" / region / "master"
+    if not master_path.exists():
+        raise SystemExit(f"No masterdata for {region} at {master_path}")
+    data_version = read_data_version(master_path)
+    tables = {
+        name: read_master_file(master_path, name, data_version) for name in TABLES
+    }
+
+    print(f"{'scale':>6} {'musics':>8} {'scan ms':>10} {'grouped ms':>11}")
+    for factor in factors:
+        scaled = _scaled(tables, factor)
+        # grouping happens once per snapshot, so it's part of the grouped time
+        fresh = _scaled(tables, factor)
+        print(
+            f"{str(factor) + 'x':>6} {len(scaled['musics']):>8} "
+            f"{_time_ms(lambda: _scan_join(scaled)):>10.1f} "
+            f"{_time_ms(lambda: _grouped_join(fresh)):>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Measure the request descriptor and response validation costs on a
+leaderboard-sized (top 100) response: the old pydantic RequestData vs the
+dataclass, and eager model_validate vs LazyModel.
+
+    python -m scripts.bench_request_data
+    python -m scripts.bench_request_data 1000   # iterations
+"""
+
+import sys
+import time
+from pathlib import Path
+from typing import Generic, Optional, Type
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pydantic import BaseModel
+
+from pjsk_api.client import RequestData, RequestPriority, T
+from pjsk_api.lazy import LazyModel
+
+
+class _PydanticRequestData(BaseModel, Generic[T]):
+    """RequestData as it was before"""
+
+    base_url: str
+    path: str
+    method: str = "GET"
+    data: Optional[dict] = None
+    headers: Optional[dict] = None
+    params: Optional[dict] = None
+    response_model: Optional[Type[T]] = None
+    trailing_slash: bool = False
+    coalesce: bool = True
+    priority: RequestPriority = RequestPriority.NORMAL
+
+    model_config = {"arbitrary_types_allowed": True}
+
+
+class UserCard(BaseModel):
+    cardId: int
+    level: int
+    masterRank: int
+    specialTrainingStatus: str
+    defaultImage: str
+
+
+class Ranking(BaseModel):
+    userId: int
+    score: int
+    rank: int
+    name: str
+    userCard: UserCard
+    userProfile: dict
+    userCheerfulCarnival: dict
+    userProfileHonors: list[dict]
+
+
+class RankingResponse(BaseModel):
+    isOccupied: bool
+    rankings: list[Ranking]
+
+
+def _leaderboard(size: int = 100) -> dict:
+    return {
+        "isOccupied": False,
+        "rankings": [
+            {
+                "userId": 10**15 + i,
+                "score": 10**8 - i * 1000,
+                "rank": i + 1,
+                "name": f"player{i}",
+                "userCard": {
+                    "cardId": 1000 + i,
+                    "level": 60,
+                    "masterRank": 5,
+                    "specialTrainingStatus": "done",
+                    "defaultImage": "special_training",
+                },
+                "userProfile": {"word": "hi" * 20, "honorId1": 1, "honorLevel1": 1},
+                "userCheerfulCarnival": {},
+                "userProfileHonors": [
+                    {"seq": s, "profileHonorType": "normal", "honorId": s}
+                    for s in range(1, 4)
+                ],
+            }
+            for i in range(size)
+        ],
+    }
+
+
+def _time_us(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) * 1e6 / iterations
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    payload = _leaderboard()
+    kwargs = dict(
+        base_url="https://example.invalid/api",
+        path="/user/{user_id}/event/150/ranking",
+        params={"rankingViewType": "top100"},
+        response_model=RankingResponse,
+    )
+
+    rows = [
+        (
+            "RequestData (pydantic)",
+            _time_us(lambda: _PydanticRequestData(**kwargs), iterations),
+        ),
+        (
+            "RequestData (dataclass)",
+            _time_us(lambda: RequestData(**kwargs), iterations),
+        ),
+        (
+            "model_validate (top 100)",
+            _time_us(lambda: RankingResponse.model_validate(payload), iterations),
+        ),
+        (
+            "LazyModel, read isOccupied",
+            _time_us(
+                lambda: LazyModel(RankingResponse, payload).isOccupied, iterations
+            ),
+        ),
+        (
+            "LazyModel, read rankings",
+            _time_us(lambda: LazyModel(RankingResponse, payload).rankings, iterations),
+        ),
+        (
+            "LazyModel, raw passthrough",
+            _time_us(lambda: LazyModel(RankingResponse, payload).raw, iterations),
+        ),
+    ]
+    print(f"{'case':<30} {'us/op':>10}")
+    for name, us in rows:
+        print(f"{name:<30} {us:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()